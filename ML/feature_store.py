@@ -0,0 +1,124 @@
+# feature_store.py
+import hashlib
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+
+from feature_registry import TIER_WHOIS, tiers_for  # backend/ must be on sys.path (see train.py)
+from whois_cache import DEFAULT_TTLS
+
+STORE_DIR = Path(__file__).parent / "data"
+WHOIS_MAX_AGE_DAYS = 30  # Older WHOIS snapshots are looked up again (domain_age drifts)
+
+def url_key(url: str) -> bytes:
+    return hashlib.sha1(url.encode('utf-8', 'surrogatepass')).digest()
+
+class FeatureStore:
+    """
+    On-disk cache of extracted training features (one NPZ file), so a retrain only
+    extracts URLs it has not seen before. Rows are keyed by the SHA-1 of the URL and
+    are only valid for the extractor version and feature columns they were built
+    with. Rows holding WHOIS features expire: after WHOIS_MAX_AGE_DAYS, or as soon as
+    the WHOIS cache would retry them (whois_cache.DEFAULT_TTLS) when their lookup
+    failed, so a timeout or rate limit during one run is not frozen into the store.
+    """
+
+    def __init__(self, path, feature_names: list, extractor_version: str,
+                 whois_max_age_days: float = WHOIS_MAX_AGE_DAYS):
+        self.path = Path(path)
+        self.feature_names = list(feature_names)
+        self.extractor_version = extractor_version
+        self.whois_max_age_seconds = whois_max_age_days * 24 * 3600
+        # (column, seconds) for each WHOIS failure flag this feature set stores
+        self._failure_ttls = [(i, DEFAULT_TTLS[name]) for i, name in enumerate(self.feature_names)
+                              if name in DEFAULT_TTLS]
+        self._rows = {}  # url key -> row index in self._features
+        self._features = np.empty((0, len(self.feature_names)), dtype=np.float32)
+        self._expires_at = np.empty(0, dtype=np.float64)  # Epoch seconds, inf = no WHOIS (never)
+        self._load()
+
+    def _load(self):
+        if not self.path.exists():
+            return
+        with np.load(self.path, allow_pickle=False) as data:
+            if ('expires_at' not in data.files or str(data['extractor_version']) != self.extractor_version
+                    or list(data['feature_names']) != self.feature_names):
+                print(f"[Feature Store] {self.path.name} was built by another extractor version or "
+                      f"feature set; starting over.")
+                return
+            keys = data['keys']
+            self._features = data['features']
+            self._expires_at = data['expires_at']
+        self._rows = {key.tobytes(): i for i, key in enumerate(keys)}
+        print(f"[Feature Store] Loaded {len(self._rows)} stored rows from {self.path.name}")
+
+    def __len__(self):
+        return len(self._rows)
+
+    def extract(self, extractor, urls, use_whois: bool = True, **batch_kwargs) -> np.ndarray:
+        """
+        Feature matrix for urls in order, like extractor.extract_features_batch, but
+        only URLs missing from the store (or whose row expired) are extracted. New rows
+        are added to the store; call save() to persist them.
+        """
+        urls = [str(url) for url in urls]
+        keys = [url_key(url) for url in urls]
+        stored_rows = np.array([self._rows.get(key, -1) for key in keys], dtype=np.int64)
+        is_stored = stored_rows >= 0
+        is_stored[is_stored] = self._expires_at[stored_rows[is_stored]] > time.time()
+
+        missing = [row for row in range(len(urls)) if not is_stored[row]]
+        new_urls = list(dict.fromkeys(urls[row] for row in missing))
+        print(f"[Feature Store] {len(urls) - len(missing)} rows reused, extracting {len(new_urls)} new URLs")
+        if new_urls:
+            new_features = extractor.extract_features_batch(new_urls, self.feature_names,
+                                                            use_whois=use_whois, **batch_kwargs)
+            uses_whois = use_whois and extractor.enable_whois and TIER_WHOIS in tiers_for(self.feature_names)
+            self._add([url_key(url) for url in new_urls], new_features, self._expiry(new_features, uses_whois))
+            stored_rows[missing] = [self._rows[keys[row]] for row in missing]
+        return self._features[stored_rows]
+
+    def _expiry(self, features: np.ndarray, uses_whois: bool) -> np.ndarray:
+        """Expiry of each new row: never without WHOIS, sooner when its lookup failed."""
+        if not uses_whois:
+            return np.full(len(features), np.inf)
+        now = time.time()
+        expires_at = np.full(len(features), now + self.whois_max_age_seconds)
+        for column, ttl in self._failure_ttls:
+            failed = features[:, column] == 1
+            expires_at[failed] = np.minimum(expires_at[failed], now + ttl)
+        return expires_at
+
+    def _add(self, keys: list, features: np.ndarray, expires_at: np.ndarray):
+        """Stores rows for keys; expired rows are overwritten in place, new ones appended."""
+        rows = []
+        appended = 0
+        for key in keys:
+            row = self._rows.get(key)
+            if row is None:
+                row = self._rows[key] = len(self._features) + appended
+                appended += 1
+            rows.append(row)
+        if appended:
+            self._features = np.vstack([self._features, np.empty((appended, len(self.feature_names)), dtype=np.float32)])
+            self._expires_at = np.concatenate([self._expires_at, np.empty(appended)])
+        self._features[rows] = features
+        self._expires_at[rows] = expires_at
+
+    def save(self):
+        """Writes the store atomically (temp file + rename)."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Raw 20-byte digests as uint8 rows ('S20' would strip trailing NUL bytes)
+        keys = np.frombuffer(b''.join(sorted(self._rows, key=self._rows.get)), dtype=np.uint8).reshape(-1, 20)
+        tmp_path = self.path.with_suffix('.tmp.npz')
+        np.savez(tmp_path, keys=keys, features=self._features, expires_at=self._expires_at,
+                 feature_names=np.array(self.feature_names), extractor_version=np.array(self.extractor_version))
+        os.replace(tmp_path, self.path)
+        print(f"[Feature Store] Saved {len(self._rows)} rows to {self.path}")
+
+def open_feature_store(extractor, feature_names: list, use_whois: bool) -> FeatureStore:
+    """Store file for a feature set: WHOIS and lexical-only training keep separate files."""
+    name = "feature_store_whois.npz" if use_whois and extractor.enable_whois else "feature_store_lexical.npz"
+    return FeatureStore(STORE_DIR / name, feature_names, extractor.version)
@@ -1,15 +1,20 @@
 # train_robust_without_whois.py
+import os
+import sys
 import pandas as pd
 from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import accuracy_score, classification_report
 import joblib
 from pathlib import Path
-from tqdm import tqdm
 
-from feature_extractor import FeatureExtractor
 from data_loader import get_balanced_dataset
 
+# The feature extractor lives in the backend so training and serving share one implementation
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+from feature_extractor_1 import FeatureExtractor
+from feature_store import open_feature_store
+
 def train_robust_model():
     """
     Train a high-accuracy model WITHOUT WHOIS for reliable base predictions
@@ -33,19 +38,14 @@ def train_robust_model():
 
     print("\nExtracting features WITHOUT WHOIS (fast and reliable)...")
     extractor = FeatureExtractor(enable_whois=False)  # No WHOIS during training
-    features_list = []
-    
-    # Fast extraction without WHOIS
-    for url in tqdm(df['url'], desc="Extracting features"):
-        try:
-            features = extractor.extract_features(url)
-            features_list.append(features)
-        except Exception as e:
-            print(f"\n[Warning] Failed to extract features: {e}")
-            features_list.append({})
+    feature_names = extractor.default_feature_names(use_whois=False)
     
-    print("\nConverting features to DataFrame...")
-    X = pd.DataFrame(features_list)
+    # Vectorized extraction on all cores, only for URLs not in the feature store yet;
+    # rows stay in dataset order
+    store = open_feature_store(extractor, feature_names, use_whois=False)
+    X = pd.DataFrame(store.extract(extractor, df['url'], use_whois=False, processes=os.cpu_count()),
+                     columns=feature_names)
+    store.save()
     y = df['label'].values
     
     print(f"✅ Feature extraction complete:")
@@ -1,16 +1,20 @@
 # train_model_with_whois.py
+import os
+import sys
 import pandas as pd
 from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import accuracy_score, classification_report
 import joblib
 from pathlib import Path
-from tqdm import tqdm
-from concurrent.futures import ThreadPoolExecutor, as_completed
 
-from feature_extractor import FeatureExtractor
 from data_loader import get_balanced_dataset
 
+# The feature extractor lives in the backend so training and serving share one implementation
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+from feature_extractor_1 import FeatureExtractor
+from feature_store import open_feature_store
+
 def train_with_whois_features(enable_whois_during_training=True):
     """
     Train model with optional WHOIS features
@@ -30,25 +34,16 @@ def train_with_whois_features(enable_whois_during_training=True):
     
     print(f"Extracting features with WHOIS = {enable_whois_during_training}...")
     extractor = FeatureExtractor(enable_whois=enable_whois_during_training)
-    features_list = []
-    
-    # Use ThreadPoolExecutor but with limited workers for WHOIS to avoid rate limiting
-    max_workers = 4 if enable_whois_during_training else 16
-    
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = {executor.submit(extractor.extract_features, url): url for url in df['url']}
-        
-        for future in tqdm(as_completed(futures), total=len(df['url']), desc="Extracting features"):
-            try:
-                features = future.result()
-                features_list.append(features)
-            except Exception as e:
-                url = futures[future]
-                print(f"\n[Warning] Failed to extract features from: {url} - Error: {e}")
-                features_list.append({})
+    feature_names = extractor.default_feature_names()
     
-    print("\nConverting features to DataFrame...")
-    X = pd.DataFrame(features_list)
+    # Lexical features are vectorized over the whole column on a process pool (CPU-bound);
+    # WHOIS runs once per unique domain on a few threads to avoid rate limiting (I/O-bound).
+    # Rows stay in dataset order.
+    # URLs already in the feature store (with a recent enough WHOIS snapshot) are reused.
+    store = open_feature_store(extractor, feature_names, use_whois=enable_whois_during_training)
+    X = pd.DataFrame(store.extract(extractor, df['url'], whois_workers=4, processes=os.cpu_count()),
+                     columns=feature_names)
+    store.save()
     y = df['label'].values
     
     print(f"Feature extraction complete:")
@@ -1,8 +1,15 @@
 # whois_enhanced_predictor.py
+import sys
 import joblib
 import pandas as pd
 from pathlib import Path
 
+# The feature extractor lives in the backend so training and serving share one implementation
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+# Features _apply_whois_enhancement reads on top of the base model's own
+ADJUSTMENT_FEATURES = ['domain_age', 'is_trusted_domain', 'whois_lookup_failed', 'whois_domain_not_found']
+
 class WHOISEnhancedPredictor:
     """
     Uses a robust base model and enhances predictions with WHOIS data
@@ -27,7 +34,7 @@ class WHOISEnhancedPredictor:
             self.base_model = model_payload['model']
             self.feature_names = model_payload.get('feature_names', [])
             # Use WHOIS-enabled extractor for prediction
-            from feature_extractor import FeatureExtractor
+            from feature_extractor_1 import FeatureExtractor
             self.feature_extractor = FeatureExtractor(enable_whois=True)
             self.is_loaded = True
             
@@ -53,8 +60,9 @@ class WHOISEnhancedPredictor:
                 return self._error_response("Model not loaded")
         
         try:
-            # Extract features with WHOIS
-            features_dict = self.feature_extractor.extract_features(url)
+            # Extract the base model's features plus the ones the WHOIS adjustment reads
+            features_dict = self.feature_extractor.extract_features(
+                url, feature_names=list(self.feature_names) + ADJUSTMENT_FEATURES)
             
             # Prepare features for base model (exclude WHOIS features)
             base_features = {k: v for k, v in features_dict.items() if k in self.feature_names}
@@ -0,0 +1,145 @@
+# analysis_store.py
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from shared_cache import open_shared_cache
+
+SHARED_POLL_SECONDS = 0.5  # How often a worker re-reads an analysis another worker is running
+
+class ProgressiveAnalysis:
+    """One progressive analysis: the instant lexical report and, later, the enriched one."""
+    __slots__ = ('analysis_id', 'url', 'created_at', 'status', 'lexical', 'enriched', 'error', 'task',
+                 '_done', '_publish', '_last_write')
+
+    def __init__(self, url: str, publish=None):
+        self.analysis_id = uuid.uuid4().hex
+        self.url = url
+        self.created_at = time.monotonic()
+        self.status = 'pending'   # pending -> complete | failed
+        self.lexical = None
+        self.enriched = None
+        self.error = None
+        self.task = None
+        self._done = asyncio.Event()
+        self._publish = publish  # Called with the record on every change (shared store)
+        self._last_write = None  # concurrent.futures.Future of the latest shared-store write
+
+    def set_lexical(self, report: dict):
+        self.lexical = report
+        self._changed()
+
+    def finish(self, report: dict):
+        self.enriched = report
+        self.status = 'complete'
+        self._done.set()
+        self._changed()
+
+    def fail(self, error: str):
+        self.error = error
+        self.status = 'failed'
+        self._done.set()
+        self._changed()
+
+    def _changed(self):
+        if self._publish is not None:
+            self._last_write = self._publish(self)
+
+    async def published(self):
+        """Waits until the latest change is visible to the other workers."""
+        if self._last_write is not None:
+            await asyncio.wrap_future(self._last_write)
+
+    async def wait(self):
+        await self._done.wait()
+
+    def to_dict(self) -> dict:
+        return {
+            'analysis_id': self.analysis_id,
+            'url': self.url,
+            'status': self.status,
+            'lexical': self.lexical,
+            'enriched': self.enriched,
+            'error': self.error,
+        }
+
+class SharedAnalysis:
+    """Read-only view of an analysis running in another worker process."""
+
+    def __init__(self, shared, state: dict):
+        self._shared = shared
+        self._state = state
+
+    def __getattr__(self, name):
+        try:
+            return self._state[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    async def wait(self):
+        while self._state['status'] == 'pending':
+            await asyncio.sleep(SHARED_POLL_SECONDS)
+            entry = await asyncio.to_thread(self._shared.get, self._state['analysis_id'])
+            if entry is None:
+                self._state = {**self._state, 'status': 'failed', 'error': "Analysis expired before it finished."}
+            else:
+                self._state = entry[0]
+
+    def to_dict(self) -> dict:
+        return dict(self._state)
+
+class AnalysisStore:
+    """
+    Bounded in-memory registry of progressive analyses, so poll/SSE clients can pick
+    up the enriched verdict. Old records expire after ttl_seconds. Only used from the
+    event loop, so no locking is needed. With a SharedCache behind it (multi-worker
+    mode), every change is also written there, so a poll or SSE request that lands on
+    another worker than the one running the analysis still finds it. SQLite is never
+    touched on the event loop: writes go through one writer thread (which keeps them
+    in order) and reads through asyncio.to_thread.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: int = 600, shared=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.shared = shared
+        self._records = OrderedDict()
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="analysis-store") if shared else None
+
+    def create(self, url: str) -> ProgressiveAnalysis:
+        self._expire()
+        record = ProgressiveAnalysis(url, self._publish if self.shared else None)
+        self._records[record.analysis_id] = record
+        while len(self._records) > self.max_entries:
+            self._records.popitem(last=False)
+        return record
+
+    async def get(self, analysis_id: str):
+        """The local record, a SharedAnalysis if another worker owns it, or None."""
+        self._expire()
+        record = self._records.get(analysis_id)
+        if record is None and self.shared:
+            entry = await asyncio.to_thread(self.shared.get, analysis_id)
+            if entry is not None:
+                return SharedAnalysis(self.shared, entry[0])
+        return record
+
+    def _publish(self, record: ProgressiveAnalysis):
+        seconds_left = record.created_at + self.ttl_seconds - time.monotonic()
+        if seconds_left > 0:
+            return self._writer.submit(self.shared.set, record.analysis_id, record.to_dict(), seconds_left)
+        return None
+
+    def _expire(self):
+        # Records are kept in creation order, so expired ones are always at the front.
+        cutoff = time.monotonic() - self.ttl_seconds
+        while self._records:
+            record = next(iter(self._records.values()))
+            if record.created_at > cutoff:
+                break
+            self._records.popitem(last=False)
+
+# Singleton instance shared by the orchestrator and the API
+analysis_store = AnalysisStore(shared=open_shared_cache('analyses'))
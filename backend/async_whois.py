@@ -0,0 +1,250 @@
+# async_whois.py
+# asyncio WHOIS client speaking the port-43 protocol (RFC 3912) directly: one event
+# loop can keep thousands of lookups in flight without a thread each. Produces the
+# same feature dict as RobustWhoisHandler.get_whois_features and shares its caches.
+import asyncio
+import re
+import time
+from datetime import datetime, timezone
+
+from single_flight import AsyncSingleFlight
+from metrics import STAGE_LATENCY, WHOIS_ERRORS, WHOIS_CACHE_LOOKUPS
+from whois_cache import DEFAULT_TTLS, WhoisMemoryCache, open_whois_cache
+from registry_guard import registry_guard
+from whois_handler import RobustWhoisHandler
+from domain_parser import registrable_domain
+
+IANA_WHOIS_SERVER = "whois.iana.org"  # Knows the registry WHOIS server of every TLD
+WHOIS_PORT = 43
+MAX_RESPONSE_BYTES = 256 * 1024
+
+# Servers that only answer a specially formatted query
+QUERY_FORMATS = {
+    'whois.denic.de': '-T dn,ace {domain}',
+    'whois.jprs.jp': '{domain}/e',
+}
+
+IPV4_PATTERN = re.compile(r"^\d{1,3}(\.\d{1,3}){3}$")
+ROOT_REFERRAL_PATTERN = re.compile(r"^\s*(?:refer|whois)\s*:\s*(\S+)", re.IGNORECASE | re.MULTILINE)
+REFERRAL_PATTERN = re.compile(r"^\s*(?:registrar whois server|referralserver|whois server)\s*:\s*(\S+)",
+                              re.IGNORECASE | re.MULTILINE)
+
+def _field_pattern(*keys) -> re.Pattern:
+    return re.compile(r"^\s*(?:" + '|'.join(re.escape(key) for key in keys) + r")\s*:\s*(\S.*?)\s*$",
+                      re.IGNORECASE | re.MULTILINE)
+
+CREATION_PATTERN = _field_pattern(
+    'creation date', 'created', 'created on', 'created date', 'registered on', 'registered',
+    'registration date', 'registration time', 'domain registration date', 'domain create date')
+EXPIRATION_PATTERN = _field_pattern(
+    'registry expiry date', 'registrar registration expiration date', 'expiration date', 'expiry date',
+    'expires on', 'expires', 'expire date', 'expiration time', 'domain expiration date', 'paid-till')
+NOT_FOUND_PATTERN = re.compile(
+    r"no match for|not found|no entries found|no data found|no object found|status:\s*(?:free|available)"
+    r"|domain (?:name )?not (?:found|registered)|is available for registration", re.IGNORECASE)
+QUOTA_PATTERN = re.compile(r"quota exceeded|rate limit|limit exceeded|too many (?:requests|queries)"
+                           r"|query limit", re.IGNORECASE)
+
+DATE_FORMATS = ('%d-%b-%Y', '%d.%m.%Y', '%Y.%m.%d', '%Y/%m/%d', '%d/%m/%Y', '%Y%m%d', '%d %b %Y',
+                '%Y-%m-%d %H:%M:%S', '%d-%b-%Y %H:%M:%S', '%Y.%m.%d %H:%M:%S')
+
+def parse_whois_date(value: str):
+    """Epoch seconds of a WHOIS date string, or None; dates without a zone are UTC."""
+    for candidate in (value, value.split()[0]):
+        try:
+            parsed = datetime.fromisoformat(candidate.replace('Z', '+00:00'))
+        except ValueError:
+            parsed = None
+            for date_format in DATE_FORMATS:
+                try:
+                    parsed = datetime.strptime(candidate, date_format)
+                    break
+                except ValueError:
+                    continue
+        if parsed is not None:
+            if parsed.tzinfo is None:
+                parsed = parsed.replace(tzinfo=timezone.utc)
+            return parsed.timestamp()
+    return None
+
+def parse_whois_response(text: str) -> dict:
+    """WHOIS record (see whois_cache.WhoisCache) from a server's raw answer."""
+    record = {'creation_date': None, 'expiration_date': None, 'error': None}
+    creation = CREATION_PATTERN.search(text)
+    if creation:
+        record['creation_date'] = parse_whois_date(creation.group(1))
+    if record['creation_date'] is None:
+        if QUOTA_PATTERN.search(text):
+            record['error'] = 'whois_quota_exceeded'
+        elif NOT_FOUND_PATTERN.search(text):
+            record['error'] = 'whois_domain_not_found'
+        return record
+    expiration = EXPIRATION_PATTERN.search(text)
+    if expiration:
+        record['expiration_date'] = parse_whois_date(expiration.group(1))
+    return record
+
+class WhoisQueryError(Exception):
+    """A WHOIS server could not be reached or hung up without answering."""
+
+class AsyncWhoisClient:
+    """
+    Looks a domain up the way the whois command does: the root server (IANA) names
+    the TLD's registry server, the registry answers, and if its answer has no dates
+    the registrar server it refers to is asked as well. Connections per WHOIS server
+    are capped (registries throttle or ban clients that open too many), concurrent
+    lookups of one domain share a single query, and records go through the same
+    memory and persistent caches as RobustWhoisHandler. The persistent cache is SQLite
+    shared with other processes (a write lock can make it wait), so it is only ever
+    used from worker threads, never on the event loop.
+
+    root_server and port are injectable ("host" or "host:port"), so the client can be
+    pointed at a local stand-in server.
+    """
+
+    def __init__(self, root_server: str = IANA_WHOIS_SERVER, port: int = WHOIS_PORT, timeout: float = 5,
+                 per_server_limit: int = 4, max_cached_domains: int = 20000, ttls: dict = None,
+                 guard=registry_guard):
+        self.root_server = root_server
+        self.port = port
+        self.timeout = timeout
+        self.per_server_limit = per_server_limit
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self._cache = WhoisMemoryCache(max_cached_domains)
+        self._persistent_cache = open_whois_cache()
+        self._flights = AsyncSingleFlight()
+        self._guard = guard  # Same per-registry rate limits and breakers as the blocking handler
+        self._tld_servers = {}  # tld -> registry WHOIS server (None: the root knows none)
+        self._server_slots = {}  # server -> asyncio.Semaphore(per_server_limit)
+
+    async def get_whois_features(self, domain: str) -> dict:
+        """Same features as RobustWhoisHandler.get_whois_features, without blocking a thread."""
+        clean_domain = registrable_domain(domain.split('/')[0])
+        if IPV4_PATTERN.match(clean_domain):
+            return RobustWhoisHandler.features_from_record({'creation_date': None, 'expiration_date': None,
+                                                            'error': 'whois_other_error'})
+
+        record = await self._cached_record(clean_domain)
+        if record is not None:
+            WHOIS_CACHE_LOOKUPS.inc('hit')
+        else:
+            WHOIS_CACHE_LOOKUPS.inc('miss')
+            record = await self._flights.do(clean_domain, self._lookup_and_store, clean_domain)
+        return RobustWhoisHandler.features_from_record(record)
+
+    async def _cached_record(self, clean_domain: str):
+        record = self._cache.get(clean_domain)
+        if record is None and self._persistent_cache:
+            entry = await asyncio.to_thread(self._persistent_cache.get, clean_domain)
+            if entry is not None:
+                record = entry[0]
+                self._cache.put(clean_domain, *entry)
+        return record
+
+    async def _lookup_and_store(self, clean_domain: str) -> dict:
+        tld = clean_domain.rsplit('.', 1)[-1]
+        # The guard's state is in the shared SQLite file too: keep it off the event loop
+        if self._guard is not None and await asyncio.to_thread(self._guard.admit, tld):
+            stale_entry = (await asyncio.to_thread(self._persistent_cache.get, clean_domain, True)
+                           if self._persistent_cache else None)
+            return stale_entry[0] if stale_entry else {'creation_date': None, 'expiration_date': None,
+                                                       'error': 'whois_throttled'}
+        with STAGE_LATENCY.time('whois'):
+            record = await self.lookup_record(clean_domain)
+        if self._guard is not None:
+            await asyncio.to_thread(self._guard.record, tld, record['error'])
+        if record['error']:
+            WHOIS_ERRORS.inc(record['error'].replace('whois_', ''))
+        ttl = self.ttls.get(record['error'], self.ttls[None])
+        if self._persistent_cache:
+            expires_at = await asyncio.to_thread(self._persistent_cache.put, clean_domain, record, ttl)
+        else:
+            expires_at = time.time() + ttl
+        self._cache.put(clean_domain, record, expires_at)
+        return record
+
+    async def lookup_record(self, domain: str) -> dict:
+        """Uncached lookup of a registrable domain; returns a WHOIS record, never raises."""
+        try:
+            ascii_domain = domain.encode('idna').decode('ascii')
+        except UnicodeError:
+            ascii_domain = domain
+        try:
+            server = await self._registry_server(ascii_domain.rsplit('.', 1)[-1])
+            if server is None:
+                return {'creation_date': None, 'expiration_date': None, 'error': 'whois_other_error'}
+            text = await self._query(server, ascii_domain)
+            record = parse_whois_response(text)
+            # Thin registries (.com, .net) only point at the registrar's server: ask it too
+            referral = REFERRAL_PATTERN.search(text)
+            if record['error'] or record['creation_date'] is not None or not referral:
+                return record
+            registrar_server = self._normalize_server(referral.group(1))
+            if registrar_server == server:
+                return record
+            try:
+                registrar_record = parse_whois_response(await self._query(registrar_server, ascii_domain))
+            except (asyncio.TimeoutError, OSError, WhoisQueryError):
+                return record  # The registry's answer stands if the registrar is unreachable
+            return registrar_record if registrar_record['creation_date'] is not None else record
+        except asyncio.TimeoutError:
+            return {'creation_date': None, 'expiration_date': None, 'error': 'whois_timeout'}
+        except (OSError, WhoisQueryError):
+            return {'creation_date': None, 'expiration_date': None, 'error': 'whois_other_error'}
+
+    async def _registry_server(self, tld: str):
+        if tld not in self._tld_servers:
+            self._tld_servers[tld] = await self._flights.do(('tld', tld), self._ask_root, tld)
+        return self._tld_servers[tld]
+
+    async def _ask_root(self, tld: str):
+        referral = ROOT_REFERRAL_PATTERN.search(await self._query(self.root_server, tld))
+        return self._normalize_server(referral.group(1)) if referral else None
+
+    @staticmethod
+    def _normalize_server(server: str) -> str:
+        """'whois://host:port/' or 'rwhois://host' -> 'host[:port]', lower-cased."""
+        return server.split('://', 1)[-1].strip('/').lower()
+
+    def _address(self, server: str) -> tuple:
+        host, _, port = server.partition(':')
+        return host, int(port) if port.isdigit() else self.port
+
+    async def _query(self, server: str, query: str) -> str:
+        """One request/response exchange, at most per_server_limit at a time per server."""
+        slots = self._server_slots.get(server)
+        if slots is None:
+            slots = self._server_slots[server] = asyncio.Semaphore(self.per_server_limit)
+        query = QUERY_FORMATS.get(server, '{domain}').format(domain=query)
+        async with slots:
+            return await asyncio.wait_for(self._exchange(*self._address(server), query), self.timeout)
+
+    @staticmethod
+    async def _exchange(host: str, port: int, query: str) -> str:
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            writer.write(query.encode('utf-8') + b"\r\n")
+            await writer.drain()
+            chunks = []
+            received = 0
+            while received < MAX_RESPONSE_BYTES:
+                chunk = await reader.read(65536)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+                received += len(chunk)
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()  # Release the socket now, not whenever the transport is collected
+            except OSError:
+                pass  # Reset by the server: closed either way
+        if not chunks:
+            raise WhoisQueryError(f"{host} closed the connection without answering")
+        return b''.join(chunks).decode('utf-8', errors='replace')
+
+# Singleton instance for async callers
+async_whois_client = AsyncWhoisClient()
+
+async def get_whois_features_async(domain: str) -> dict:
+    return await async_whois_client.get_whois_features(domain)
@@ -1,12 +1,16 @@
 # content_analyzer.py
-import requests
-from bs4 import BeautifulSoup
 from urllib.parse import urlparse
 
+from metrics import STAGE_LATENCY
+
 def analyze_page_content(url: str) -> dict:
     """
     Fetches the live webpage and analyzes its DOM for high-confidence phishing indicators.
     """
+    # Imported on first use to keep requests/BeautifulSoup off the API startup path
+    import requests
+    from bs4 import BeautifulSoup
+
     print(f"[Field Agent] Investigating live content at: {url}")
     features = {
         'has_password_form': False,
@@ -17,7 +21,8 @@ def analyze_page_content(url: str) -> dict:
     headers = {'User-Agent': 'Mozilla/5.0 PhishEyeBot/1.0'}
 
     try:
-        response = requests.get(url, headers=headers, timeout=5, allow_redirects=True)
+        with STAGE_LATENCY.time('content_fetch'):
+            response = requests.get(url, headers=headers, timeout=5, allow_redirects=True)
         response.raise_for_status()
         soup = BeautifulSoup(response.text, 'html.parser')
 
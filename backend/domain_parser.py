@@ -0,0 +1,116 @@
+# domain_parser.py
+import os
+import re
+from collections import namedtuple
+
+PUBLIC_SUFFIX_LIST_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "public_suffix_list.dat")
+
+IPV4_HOST_PATTERN = re.compile(r'^\d{1,3}(\.\d{1,3}){3}$')
+
+# 'login.example.co.uk' -> ('login.example.co.uk', 'login', 'example.co.uk', 'co.uk')
+ParsedDomain = namedtuple('ParsedDomain', ['hostname', 'subdomain', 'registrable_domain', 'suffix'])
+
+_RULE, _EXCEPTION = 1, 2
+
+class PublicSuffixList:
+    """
+    Trie of public-suffix rules (Mozilla PSL format: plain, '*.' wildcard and '!'
+    exception rules) keyed by labels from the TLD inwards, so finding the suffix
+    of a hostname costs O(labels) whatever the size of the list.
+    """
+
+    def __init__(self, rules):
+        self._root = {}
+        for rule in rules:
+            self._add(rule)
+
+    @classmethod
+    def from_file(cls, path: str = PUBLIC_SUFFIX_LIST_PATH, include_private: bool = False):
+        """Loads the ICANN section of a PSL file (plus the private section if asked)."""
+        rules = []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line.startswith('// ===END ICANN DOMAINS===') and not include_private:
+                    break
+                if line and not line.startswith('//'):
+                    rules.append(line.split()[0])
+        return cls(rules)
+
+    def _add(self, rule: str):
+        kind = _EXCEPTION if rule.startswith('!') else _RULE
+        rule = rule.lstrip('!').lower()
+        variants = {rule}
+        try:
+            variants.add(rule.encode('idna').decode('ascii'))  # Hostnames in URLs are punycode
+        except UnicodeError:
+            pass
+        for variant in variants:
+            node = self._root
+            for label in reversed(variant.split('.')):
+                node = node.setdefault(label, {})
+            node[None] = kind
+
+    def suffix_label_count(self, labels: list) -> int:
+        """How many of the rightmost labels form the public suffix (at least 1)."""
+        node = self._root
+        count = 1  # Default rule '*': an unknown TLD is a suffix by itself
+        for depth, label in enumerate(reversed(labels), 1):
+            child = node.get(label)
+            if child is not None and child.get(None) == _EXCEPTION:
+                return depth - 1
+            wildcard = node.get('*')
+            if wildcard is not None and wildcard.get(None) == _RULE:
+                count = depth
+            if child is None:
+                break
+            if child.get(None) == _RULE:
+                count = depth
+            node = child
+        return count
+
+class DomainParser:
+    """Splits a netloc into subdomain, registrable domain and public suffix."""
+
+    def __init__(self, suffix_list: PublicSuffixList = None):
+        self.suffix_list = suffix_list or PublicSuffixList.from_file()
+
+    @staticmethod
+    def hostname(netloc: str) -> str:
+        """Lower-cased host of a netloc, without credentials, port or trailing dot."""
+        host = netloc.lower().rpartition('@')[2]
+        if host.startswith('['):  # IPv6 literal
+            return host[1:].partition(']')[0]
+        return host.partition(':')[0].rstrip('.')
+
+    def parse(self, netloc: str) -> ParsedDomain:
+        hostname = self.hostname(netloc)
+        if not hostname or ':' in hostname or IPV4_HOST_PATTERN.match(hostname):
+            # IP addresses have no suffix; the address itself is what gets looked up
+            return ParsedDomain(hostname, '', hostname, '')
+
+        labels = hostname.split('.')
+        suffix_labels = self.suffix_list.suffix_label_count(labels)
+        if suffix_labels >= len(labels):
+            # The host is itself a public suffix (e.g. 'co.uk'): nothing is registrable
+            return ParsedDomain(hostname, '', '', hostname)
+        return ParsedDomain(
+            hostname,
+            '.'.join(labels[:-suffix_labels - 1]),
+            '.'.join(labels[-suffix_labels - 1:]),
+            '.'.join(labels[-suffix_labels:]),
+        )
+
+    def registrable_domain(self, netloc: str) -> str:
+        """Key for caches and trust checks: the registrable domain, else the bare hostname."""
+        parsed = self.parse(netloc)
+        return parsed.registrable_domain or parsed.hostname
+
+# Singleton instance, loaded once per process (before fork in multi-worker mode)
+domain_parser = DomainParser()
+
+def parse_domain(netloc: str) -> ParsedDomain:
+    return domain_parser.parse(netloc)
+
+def registrable_domain(netloc: str) -> str:
+    return domain_parser.registrable_domain(netloc)
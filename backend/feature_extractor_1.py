@@ -2,11 +2,47 @@
 
 import re
 import math
+import time
+import hashlib
+from collections import Counter, namedtuple
+from functools import lru_cache
 from urllib.parse import urlparse
 
 # CRITICAL: This line means you MUST have a 'whois_handler.py' file
 # in the same directory, containing a class named 'RobustWhoisHandler'.
 from whois_handler import RobustWhoisHandler
+from keyword_matcher import KeywordMatcher, load_terms
+from domain_parser import ParsedDomain, parse_domain, registrable_domain
+from metrics import STAGE_LATENCY
+from feature_registry import LEXICAL_FEATURE_NAMES, WHOIS_FEATURE_NAMES, TIER_WHOIS, tiers_for
+
+# What extract_features reports when WHOIS is disabled
+WHOIS_DISABLED_FEATURES = {
+    'whois_lookup_failed': 1, 'domain_age': -1, 'domain_lifespan': -1,
+    'whois_timeout': 0, 'whois_domain_not_found': 0, 'whois_other_error': 0
+}
+
+IP_HOST_PATTERN = re.compile(r"^\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}(:\d+)?$")
+# netloc / path split equivalent to urlparse for http(s) URLs without the characters
+# urlparse treats specially (tab/CR/LF removal, IPv6 brackets, ;params)
+SCHEME_PATTERN = re.compile(r'^https?://')
+SIMPLE_URL_PATTERN = re.compile(r'^https?://([^/?#]*)([^?#]*)')
+URLPARSE_SPECIAL_CHARS = re.compile(r'[\t\r\n\[\];\x00]')
+LOG_2 = math.log(2.0)  # Entropy is in bits
+
+# Features that depend only on the netloc, computed once per host (see _host_features)
+HostFeatures = namedtuple('HostFeatures', [
+    'parsed_domain', 'is_trusted_domain', 'suspicious_tld', 'has_ip', 'domain_entropy',
+    'has_brand', 'brand_in_subdomain',
+])
+HOST_FEATURE_CACHE_SIZE = 10000  # Hosts memoized per extractor (LRU)
+
+# Bump whenever a feature's definition changes: stored training features (ML/feature_store.py)
+# from another version are re-extracted. Edits to the backend/data term lists are picked up
+# automatically through FeatureExtractor.version.
+EXTRACTOR_VERSION = 7
+
+PROCESS_CHUNK_ROWS = 50000  # URLs per task when batch extraction runs on a process pool
 
 class FeatureExtractor:
     """
@@ -15,11 +51,21 @@ class FeatureExtractor:
     # THIS IS THE CORRECT CONSTRUCTOR THAT SOLVES THE ERROR
     def __init__(self, enable_whois=True):
         print("[Feature Extractor] Initializing with modern settings...")
-        self.phishing_keywords = {
-            'login', 'secure', 'account', 'update', 'verify', 'webscr', 'signin', 
-            'banking', 'confirm', 'ebayisapi', 'apple', 'microsoft', 'google', 
-            'paypal', 'amazon'
-        }
+        # Term lists live in backend/data and are matched in one pass by a single automaton
+        self.phishing_keywords = set(load_terms('phishing_keywords.txt'))
+        self.brand_keywords = load_terms('brand_keywords.txt')
+        self.url_shorteners = load_terms('url_shorteners.txt')
+        self.keyword_matcher = KeywordMatcher({
+            'keyword': self.phishing_keywords,
+            'brand': self.brand_keywords,
+            'shortener': self.url_shorteners,
+        })
+        # Case-sensitive shortener check for the rare URLs whose lower-cased form changes length
+        self.shortener_pattern = re.compile('|'.join(re.escape(term) for term in self.url_shorteners))
+        self.user_content_hosts = frozenset(load_terms('user_content_hosts.txt'))
+        term_digest = hashlib.sha1(repr((sorted(self.phishing_keywords), self.brand_keywords, self.url_shorteners,
+                                         sorted(self.user_content_hosts))).encode()).hexdigest()[:12]
+        self.version = f"{EXTRACTOR_VERSION}-{term_digest}"
         
         self.trusted_domains = {
             'github.com', 'gitlab.com', 'stackoverflow.com', 'wikipedia.org',
@@ -31,22 +77,118 @@ class FeatureExtractor:
         
         self.suspicious_tlds = {'.tk', '.ml', '.ga', '.cf', '.gq', '.xyz', '.top', '.loan', '.club'}
         
+        # Crawls and batches hit the same hosts over and over; WHOIS has its own cache
+        self._host_features = lru_cache(maxsize=HOST_FEATURE_CACHE_SIZE)(self._compute_host_features)
+        
         self.whois_handler = RobustWhoisHandler(timeout=5, max_retries=1) if enable_whois else None
         self.enable_whois = enable_whois
         print(f"[Feature Extractor] WHOIS lookups are {'ENABLED' if self.enable_whois else 'DISABLED'}.")
 
-    def _calculate_entropy(self, text: str) -> float:
-        if not text: return 0.0
-        prob = [float(text.count(c)) / len(text) for c in dict.fromkeys(list(text))]
-        entropy = -sum([p * math.log(p) / math.log(2.0) for p in prob if p > 0])
+    @staticmethod
+    def _scan_characters(text: str):
+        """
+        Single pass over text: per-character counts (in first-occurrence order) plus
+        the number of digits and letters, computed from the distinct characters only.
+        """
+        counts = Counter(text)
+        digits = letters = 0
+        for char, count in counts.items():
+            if char.isdigit():
+                digits += count
+            if char.isalpha():
+                letters += count
+        return counts, digits, letters
+
+    @staticmethod
+    def _entropy_from_counts(counts, length: int) -> float:
+        """Shannon entropy from a character histogram, summed in the same order as before."""
+        if not length: return 0.0
+        prob = [float(count) / length for count in counts.values()]
+        entropy = -sum([p * math.log(p) / LOG_2 for p in prob if p > 0])
         return entropy
 
-    def _is_trusted_domain(self, domain: str) -> bool:
-        clean_domain = domain.lower().replace('www.', '')
-        return clean_domain in self.trusted_domains
+    def _calculate_entropy(self, text: str) -> float:
+        return self._entropy_from_counts(Counter(text), len(text))
+
+    def _match_terms(self, url: str, url_lower: str) -> tuple:
+        """
+        keyword_count, has_brand_name and has_shortening from one automaton pass
+        over the lower-cased URL.
+        """
+        same_offsets = len(url_lower) == len(url)
+        keywords = set()
+        has_brand_name = 0
+        has_shortening = 0
+        for start, end, category, term in self.keyword_matcher.find_all(url_lower):
+            if category == 'keyword':
+                keywords.add(term)
+            elif category == 'brand':
+                has_brand_name = 1
+            elif same_offsets and url[start:end] == term:  # Shorteners are case-sensitive
+                has_shortening = 1
+        if not same_offsets:
+            has_shortening = 1 if self.shortener_pattern.search(url) else 0
+        return len(keywords), has_brand_name, has_shortening
+
+    def _compute_host_features(self, domain: str) -> HostFeatures:
+        """Host-level features of a lower-cased netloc (memoized as _host_features)."""
+        parsed_domain = parse_domain(domain)
+        brand_spans = [(start, end) for start, end, category, _ in self.keyword_matcher.find_all(domain)
+                       if category == 'brand']
+        # The subdomain starts the hostname, right after any credentials
+        subdomain = parsed_domain.subdomain
+        subdomain_start = domain.rfind('@') + 1
+        if domain.startswith(subdomain, subdomain_start):
+            subdomain_end = subdomain_start + len(subdomain)
+            in_subdomain = any(start >= subdomain_start and end <= subdomain_end for start, end in brand_spans)
+        else:
+            in_subdomain = any(category == 'brand' for _, _, category, _ in self.keyword_matcher.find_all(subdomain))
+        return HostFeatures(
+            parsed_domain=parsed_domain,
+            is_trusted_domain=1 if self._is_trusted_domain(parsed_domain) else 0,
+            suspicious_tld=1 if any(domain.endswith(tld) for tld in self.suspicious_tlds) else 0,
+            has_ip=1 if IP_HOST_PATTERN.match(domain) else 0,
+            domain_entropy=self._calculate_entropy(domain),
+            has_brand=1 if brand_spans else 0,
+            brand_in_subdomain=1 if in_subdomain else 0,
+        )
 
-    def extract_features(self, url: str) -> dict:
+    def _is_trusted_domain(self, parsed_domain: ParsedDomain) -> bool:
+        # Any host under a trusted registrable domain (mail.google.com, www.paypal.com),
+        # except hosts serving user content (docs.google.com) and their subdomains
+        if parsed_domain.registrable_domain not in self.trusted_domains:
+            return False
+        labels = parsed_domain.hostname.split('.')
+        return not any('.'.join(labels[i:]) in self.user_content_hosts for i in range(len(labels)))
+
+    def extract_features(self, url: str, use_whois: bool = True, feature_names: list = None,
+                         whois_rate_limit_wait: float = 0.0) -> dict:
+        """
+        feature_names: the features the caller will actually read. The WHOIS lookup is
+        skipped when none of them needs it (see feature_registry); None means all.
+        whois_rate_limit_wait: seconds the WHOIS lookup may queue for the registry's rate limit.
+        """
+        if feature_names is not None:
+            use_whois = use_whois and TIER_WHOIS in tiers_for(feature_names)
+        return self._extract_into({}, url, use_whois, whois_rate_limit_wait)
+
+    def extract_feature_vector(self, url: str, schema, use_whois: bool = True, extra_features=(),
+                               whois_rate_limit_wait: float = 0.0):
+        """
+        Same features as extract_features, written straight into a FeatureVector in
+        the model's schema order (see feature_schema.py) instead of a dict. WHOIS only
+        runs if the schema or extra_features (read by the caller's mode) needs it.
+        """
+        use_whois = use_whois and (TIER_WHOIS in schema.tiers or TIER_WHOIS in tiers_for(extra_features))
+        return self._extract_into(schema.new_vector(), url, use_whois, whois_rate_limit_wait)
+
+    def _extract_into(self, features, url: str, use_whois: bool, whois_rate_limit_wait: float = 0.0):
+        """
+        Fills features (a dict or a FeatureVector) and returns it. whois_rate_limit_wait
+        is how long the WHOIS lookup may queue for the registry's rate limit.
+        """
         try:
+            started = time.perf_counter()
             if not re.match(r'^https?://', url):
                 url = "http://" + url
             
@@ -57,11 +199,11 @@ class FeatureExtractor:
             if not domain:
                 raise ValueError("Could not parse domain/hostname from URL.")
 
-            features = {}
+            host = self._host_features(domain)
             
             # DOMAIN REPUTATION FEATURES
-            features['is_trusted_domain'] = 1 if self._is_trusted_domain(domain) else 0
-            features['suspicious_tld'] = 1 if any(domain.endswith(tld) for tld in self.suspicious_tlds) else 0
+            features['is_trusted_domain'] = host.is_trusted_domain
+            features['suspicious_tld'] = host.suspicious_tld
             
             # LENGTH FEATURES
             features['url_length'] = len(url)
@@ -69,55 +211,272 @@ class FeatureExtractor:
             features['path_length'] = len(path)
             features['fd_length'] = len(path.split('/')[-1])
             
-            # CHARACTER PATTERNS
-            features['count-'] = url.count('-')
-            features['count@'] = url.count('@')
-            features['count?'] = url.count('?')
-            features['count%'] = url.count('%')
-            features['count.'] = url.count('.')
-            features['count='] = url.count('=')
+            # CHARACTER PATTERNS (one scan builds every single-character statistic)
+            char_counts, digit_count, letter_count = self._scan_characters(url)
+            url_lower = url.lower()
+            features['count-'] = char_counts['-']
+            features['count@'] = char_counts['@']
+            features['count?'] = char_counts['?']
+            features['count%'] = char_counts['%']
+            features['count.'] = char_counts['.']
+            features['count='] = char_counts['=']
             features['count-http'] = url.count('http')
             features['count-https'] = url.count('https')
             features['count-www'] = url.count('www')
-            features['count-digits'] = sum(c.isdigit() for c in url)
-            features['count-letters'] = sum(c.isalpha() for c in url)
+            features['count-digits'] = digit_count
+            features['count-letters'] = letter_count
             features['count-dir'] = path.count('/')
             
             # SECURITY INDICATORS
-            features['has_ip'] = 1 if re.match(r"^\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}(:\d+)?$", domain) else 0
-            features['has_shortening'] = 1 if re.search(r'bit\.ly|goo\.gl|shorte\.st|go2l\.ink|x\.co|ow\.ly|t\.co|tinyurl', url) else 0
+            features['has_ip'] = host.has_ip
+            keyword_count, has_brand_name, has_shortening = self._match_terms(url, url_lower)
+            features['has_shortening'] = has_shortening
             
             # KEYWORD ANALYSIS
-            features['keyword_count'] = sum(1 for keyword in self.phishing_keywords if keyword in url.lower())
+            features['keyword_count'] = keyword_count
             
             # ENTROPY
-            features['url_entropy'] = self._calculate_entropy(url)
-            features['domain_entropy'] = self._calculate_entropy(domain)
+            features['url_entropy'] = self._entropy_from_counts(char_counts, len(url))
+            features['domain_entropy'] = host.domain_entropy
             
             # RATIO FEATURES
             features['path_to_url_ratio'] = len(path) / len(url) if len(url) > 0 else 0
-            features['letters_to_length_ratio'] = sum(c.isalpha() for c in url) / len(url) if len(url) > 0 else 0
-            features['digits_to_length_ratio'] = sum(c.isdigit() for c in url) / len(url) if len(url) > 0 else 0
+            features['letters_to_length_ratio'] = letter_count / len(url) if len(url) > 0 else 0
+            features['digits_to_length_ratio'] = digit_count / len(url) if len(url) > 0 else 0
             
             # BRAND ANALYSIS
-            brand_keywords = ['paypal', 'apple', 'microsoft', 'google', 'amazon', 'ebay', 'bank']
-            features['has_brand_name'] = 1 if any(brand in url.lower() for brand in brand_keywords) else 0
-            features['brand_in_subdomain'] = 1 if any(brand in domain.lower().split('.')[0] for brand in brand_keywords) else 0
-            features['brand_not_in_domain'] = 1 if (features['has_brand_name'] == 1 and not any(brand in domain for brand in brand_keywords)) else 0
+            features['has_brand_name'] = has_brand_name
+            features['brand_in_subdomain'] = host.brand_in_subdomain
+            features['brand_not_in_domain'] = 1 if has_brand_name and not host.has_brand else 0
             
+            STAGE_LATENCY.observe('feature_extraction', value=time.perf_counter() - started)
+
             # WHOIS FEATURES
-            if self.enable_whois and self.whois_handler:
-                whois_features = self.whois_handler.get_whois_features(domain)
+            if use_whois and self.enable_whois and self.whois_handler:
+                whois_features = self.whois_handler.get_whois_features(domain, whois_rate_limit_wait)
                 features.update(whois_features)
             else:
-                features.update({
-                    'whois_lookup_failed': 1, 'domain_age': -1, 'domain_lifespan': -1,
-                    'whois_timeout': 0, 'whois_domain_not_found': 0, 'whois_other_error': 0
-                })
+                features.update(WHOIS_DISABLED_FEATURES)
             
             return features
 
         except Exception as e:
             # Fallback in case of any catastrophic error
             print(f"[Feature Extractor] CRITICAL ERROR processing {url}: {e}")
-            return { 'error': 1, 'domain_age': -1, 'domain_lifespan': -1 }
\ No newline at end of file
+            features.clear()
+            features.update({ 'error': 1, 'domain_age': -1, 'domain_lifespan': -1 })
+            return features
+
+    def default_feature_names(self, use_whois: bool = True) -> list:
+        """Feature columns extract_features produces for a normal URL, in order."""
+        if use_whois and self.enable_whois and self.whois_handler:
+            return LEXICAL_FEATURE_NAMES + WHOIS_FEATURE_NAMES
+        return LEXICAL_FEATURE_NAMES + list(WHOIS_DISABLED_FEATURES)
+
+    def extract_features_batch(self, urls, feature_names: list = None, use_whois: bool = True,
+                               chunk_size: int = 8192, whois_workers: int = 4, processes: int = 1,
+                               whois_rate_limit_wait: float = math.inf):
+        """
+        Vectorized extract_features over a whole column of URLs (list, pandas Series, ...).
+        Returns a float32 matrix of shape (len(urls), len(feature_names)), columns in
+        feature_names order (default: default_feature_names()); features a row does not
+        have are -1, the value the models were trained with for missing features.
+
+        Lexical features are computed with NumPy over chunks of ASCII URLs; rows that are
+        not plain ASCII or do not parse go through extract_features so the values always
+        match it. WHOIS runs once per unique domain on a small thread pool; by default
+        lookups wait for the registry rate limit rather than produce degraded rows.
+
+        The lexical stage is CPU-bound (the GIL makes threads useless for it); with
+        processes > 1 it runs in contiguous blocks of URLs on a process pool. Rows always
+        come back in input order.
+        """
+        import numpy as np
+        from concurrent.futures import ThreadPoolExecutor
+
+        urls = [str(url) for url in urls]
+        feature_names = list(feature_names or self.default_feature_names(use_whois))
+        column = {name: i for i, name in enumerate(feature_names)}
+        matrix = np.full((len(urls), len(feature_names)), -1, dtype=np.float32)
+
+        if processes > 1 and len(urls) > PROCESS_CHUNK_ROWS:
+            lexical, domains, fallback_rows = self._lexical_features_parallel(urls, chunk_size, processes)
+        else:
+            lexical, domains, fallback_rows = self._lexical_features_block(urls, chunk_size)
+
+        lexical_columns = [(j, column[name]) for j, name in enumerate(LEXICAL_FEATURE_NAMES) if name in column]
+        for j, i in lexical_columns:
+            matrix[:, i] = lexical[:, j]
+
+        # WHOIS: one lookup per unique domain, results fanned back out in row order
+        whois_columns = [name for name in feature_names if name in WHOIS_FEATURE_NAMES]
+        if whois_columns:
+            whois_active = use_whois and self.enable_whois and self.whois_handler
+            if whois_active:
+                # Subdomains of one registrable domain share a single lookup
+                whois_keys = {domain: registrable_domain(domain) for domain in set(domains) if domain}
+                unique_keys = list(dict.fromkeys(whois_keys.values()))
+                with ThreadPoolExecutor(max_workers=whois_workers) as pool:
+                    by_key = dict(zip(unique_keys, pool.map(
+                        lambda key: self.whois_handler.get_whois_features(key, whois_rate_limit_wait), unique_keys)))
+            rows = [row for row, domain in enumerate(domains) if domain is not None]
+            columns = [column[name] for name in whois_columns]
+            if whois_active:
+                table = {key: [features.get(name, -1) for name in whois_columns]
+                         for key, features in by_key.items()}
+                values = [table[whois_keys[domains[row]]] for row in rows]
+            else:
+                values = [WHOIS_DISABLED_FEATURES.get(name, -1) for name in whois_columns]
+            if rows:
+                matrix[np.ix_(rows, columns)] = values
+
+        # Rows the vectorized path cannot reproduce exactly
+        for row in fallback_rows:
+            features = self.extract_features(urls[row], use_whois=use_whois, feature_names=feature_names,
+                                             whois_rate_limit_wait=whois_rate_limit_wait)
+            matrix[row, :] = [features.get(name, -1) for name in feature_names]
+        return matrix
+
+    def _lexical_features_block(self, urls: list, chunk_size: int = 8192) -> tuple:
+        """
+        Lexical stage of extract_features_batch for a list of URLs: returns the
+        (len(urls), len(LEXICAL_FEATURE_NAMES)) matrix, the hostname of each row
+        (None for fallback rows) and the rows left for the scalar fallback.
+        """
+        import numpy as np
+
+        lexical = np.zeros((len(urls), len(LEXICAL_FEATURE_NAMES)), dtype=np.float64)
+        domains = [None] * len(urls)
+        fallback_rows = []
+        # Chunks of similar-length URLs keep the fixed-width NumPy string arrays free of padding
+        by_length = sorted(range(len(urls)), key=lambda row: len(urls[row]))
+        for start in range(0, len(by_length), chunk_size):
+            fallback_rows.extend(self._lexical_features_chunk(urls, by_length[start:start + chunk_size], lexical, domains))
+        return lexical, domains, fallback_rows
+
+    def _lexical_features_parallel(self, urls: list, chunk_size: int, processes: int) -> tuple:
+        """_lexical_features_block over a process pool; executor.map keeps the blocks in order."""
+        import numpy as np
+        from concurrent.futures import ProcessPoolExecutor
+
+        offsets = range(0, len(urls), PROCESS_CHUNK_ROWS)
+        blocks = [urls[offset:offset + PROCESS_CHUNK_ROWS] for offset in offsets]
+        lexical_blocks, domains, fallback_rows = [], [], []
+        with ProcessPoolExecutor(max_workers=processes, initializer=_init_lexical_worker) as pool:
+            results = pool.map(_lexical_worker, blocks, [chunk_size] * len(blocks))
+            for offset, (block_lexical, block_domains, block_fallback) in zip(offsets, results):
+                lexical_blocks.append(block_lexical)
+                domains.extend(block_domains)
+                fallback_rows.extend(offset + row for row in block_fallback)
+        return np.vstack(lexical_blocks), domains, fallback_rows
+
+    def _lexical_features_chunk(self, urls: list, chunk_rows: list, out, domains: list) -> list:
+        """
+        Fills out[row, :] with LEXICAL_FEATURE_NAMES and domains[row] with the hostname
+        for each ASCII URL among chunk_rows. Returns the rows left for the scalar fallback.
+        """
+        import numpy as np
+
+        fallback_rows = []
+        rows, full_urls, hosts, paths = [], [], [], []
+        for row in chunk_rows:
+            url = urls[row]
+            if not SCHEME_PATTERN.match(url):
+                url = "http://" + url
+            if not url.isascii() or URLPARSE_SPECIAL_CHARS.search(url):
+                fallback_rows.append(row)
+                continue
+            netloc, path = SIMPLE_URL_PATTERN.match(url).groups()
+            domain = netloc.lower()
+            if not domain:
+                fallback_rows.append(row)
+                continue
+            rows.append(row)
+            full_urls.append(url)
+            hosts.append(domain)
+            paths.append(path)
+            domains[row] = domain
+        if not rows:
+            return fallback_rows
+
+        url_arr = np.array(full_urls)
+        host_arr = np.array(hosts)
+        path_arr = np.array(paths)
+
+        url_len = np.char.str_len(url_arr).astype(np.float64)
+        host_len = np.char.str_len(host_arr).astype(np.float64)
+        path_len = np.char.str_len(path_arr).astype(np.float64)
+        url_hist = self._char_histograms(url_arr)
+        digits = url_hist[:, ord('0'):ord('9') + 1].sum(axis=1)
+        letters = url_hist[:, ord('A'):ord('Z') + 1].sum(axis=1) + url_hist[:, ord('a'):ord('z') + 1].sum(axis=1)
+
+        host_features = [self._host_features(host) for host in hosts]
+        # keyword_count, has_brand_name, has_shortening
+        terms = np.array([self._match_terms(url, url.lower()) for url in full_urls],
+                         dtype=np.float64).reshape(len(rows), 3)
+        has_brand = terms[:, 1]
+
+        values = {
+            'is_trusted_domain': [host.is_trusted_domain for host in host_features],
+            'suspicious_tld': [host.suspicious_tld for host in host_features],
+            'url_length': url_len,
+            'hostname_length': host_len,
+            'path_length': path_len,
+            'fd_length': path_len - (np.char.rfind(path_arr, '/') + 1),
+            'count-': url_hist[:, ord('-')],
+            'count@': url_hist[:, ord('@')],
+            'count?': url_hist[:, ord('?')],
+            'count%': url_hist[:, ord('%')],
+            'count.': url_hist[:, ord('.')],
+            'count=': url_hist[:, ord('=')],
+            'count-http': np.char.count(url_arr, 'http'),
+            'count-https': np.char.count(url_arr, 'https'),
+            'count-www': np.char.count(url_arr, 'www'),
+            'count-digits': digits,
+            'count-letters': letters,
+            'count-dir': np.char.count(path_arr, '/'),
+            'has_ip': [host.has_ip for host in host_features],
+            'has_shortening': terms[:, 2],
+            'keyword_count': terms[:, 0],
+            'url_entropy': self._entropy_from_histograms(url_hist, url_len),
+            'domain_entropy': [host.domain_entropy for host in host_features],
+            'path_to_url_ratio': path_len / url_len,
+            'letters_to_length_ratio': letters / url_len,
+            'digits_to_length_ratio': digits / url_len,
+            'has_brand_name': has_brand,
+            'brand_in_subdomain': [host.brand_in_subdomain for host in host_features],
+            'brand_not_in_domain': has_brand * [1 - host.has_brand for host in host_features],
+        }
+        for j, name in enumerate(LEXICAL_FEATURE_NAMES):
+            out[rows, j] = values[name]
+        return fallback_rows
+
+    @staticmethod
+    def _char_histograms(strings):
+        """(n, 128) matrix of per-string ASCII character counts (strings must be ASCII)."""
+        import numpy as np
+        codes = strings.view(np.uint32).reshape(len(strings), -1)
+        flat = codes.astype(np.int64) + 128 * np.arange(len(strings), dtype=np.int64)[:, None]
+        hist = np.bincount(flat.ravel(), minlength=128 * len(strings)).reshape(len(strings), 128)
+        hist[:, 0] = 0  # NUL padding of the fixed-width array, not real characters
+        return hist
+
+    @staticmethod
+    def _entropy_from_histograms(hist, lengths):
+        """Shannon entropy per row, same formula as _calculate_entropy."""
+        import numpy as np
+        rows, chars = np.nonzero(hist)  # Only characters that occur contribute
+        prob = hist[rows, chars] / lengths[rows]
+        terms = prob * np.log(prob) / np.log(2.0)
+        return -np.bincount(rows, weights=terms, minlength=len(hist))
+
+# --- PROCESS-POOL WORKERS (extract_features_batch with processes > 1) ---
+# Each worker process builds its own lexical-only extractor from the same data files.
+_worker_extractor = None
+
+def _init_lexical_worker():
+    global _worker_extractor
+    _worker_extractor = FeatureExtractor(enable_whois=False)
+
+def _lexical_worker(urls: list, chunk_size: int) -> tuple:
+    return _worker_extractor._lexical_features_block(urls, chunk_size)
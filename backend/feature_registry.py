@@ -0,0 +1,33 @@
+# feature_registry.py
+# Every feature the pipeline can produce, with the cost tier that produces it. Callers
+# ask for feature names (the model's feature_names plus whatever their mode reads) and
+# only the tiers those names need are run.
+
+TIER_LEXICAL = 'lexical'  # From the URL string alone, microseconds
+TIER_WHOIS = 'whois'      # Network: registry lookup, up to seconds
+TIER_CONTENT = 'content'  # Network: fetches and parses the live page
+
+# Column order of extract_features' output; extract_features_batch uses the same order.
+LEXICAL_FEATURE_NAMES = [
+    'is_trusted_domain', 'suspicious_tld', 'url_length', 'hostname_length', 'path_length', 'fd_length',
+    'count-', 'count@', 'count?', 'count%', 'count.', 'count=', 'count-http', 'count-https', 'count-www',
+    'count-digits', 'count-letters', 'count-dir', 'has_ip', 'has_shortening', 'keyword_count',
+    'url_entropy', 'domain_entropy', 'path_to_url_ratio', 'letters_to_length_ratio', 'digits_to_length_ratio',
+    'has_brand_name', 'brand_in_subdomain', 'brand_not_in_domain',
+]
+WHOIS_FEATURE_NAMES = [
+    'whois_lookup_failed', 'domain_age', 'domain_lifespan', 'whois_timeout', 'whois_domain_not_found',
+    'whois_private_registry', 'whois_quota_exceeded', 'whois_other_error',
+]
+# Produced by content_analyzer.analyze_page_content
+CONTENT_FEATURE_NAMES = ['has_password_form', 'form_action_is_external', 'fetch_error']
+
+FEATURE_TIERS = {
+    **{name: TIER_LEXICAL for name in LEXICAL_FEATURE_NAMES},
+    **{name: TIER_WHOIS for name in WHOIS_FEATURE_NAMES},
+    **{name: TIER_CONTENT for name in CONTENT_FEATURE_NAMES},
+}
+
+def tiers_for(feature_names) -> set:
+    """Cost tiers needed to produce feature_names (names not in the registry need none)."""
+    return {FEATURE_TIERS[name] for name in feature_names if name in FEATURE_TIERS}
@@ -0,0 +1,89 @@
+# feature_schema.py
+from collections.abc import Mapping
+
+import numpy as np
+
+from feature_registry import tiers_for
+
+MISSING_FEATURE_VALUE = -1  # What the model was trained with for absent features
+
+class FeatureSchema:
+    """
+    Ordered feature columns of a trained model (its feature_names), with a
+    name -> column lookup. Built once when the model loads.
+    """
+
+    def __init__(self, feature_names):
+        self.names = tuple(feature_names)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.tiers = tiers_for(self.names)  # Cost tiers the model needs computed
+        self._template = np.full(len(self.names), MISSING_FEATURE_VALUE, dtype=np.float32)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def new_vector(self) -> "FeatureVector":
+        return FeatureVector(self, self._template.copy())
+
+class FeatureVector(Mapping):
+    """
+    Extraction sink: feature values are written straight into a float32 array in
+    schema order, ready for the model. Features the model does not use are kept
+    aside, so the read-only mapping view (and to_dict() for the UI / explain
+    paths) still shows everything that was extracted.
+    """
+    __slots__ = ('schema', 'values', '_written', '_extras')
+
+    def __init__(self, schema: FeatureSchema, values):
+        self.schema = schema
+        self.values = values
+        self._written = set()
+        self._extras = None
+
+    def __setitem__(self, name: str, value):
+        i = self.schema.index.get(name)
+        if i is None:
+            if self._extras is None:
+                self._extras = {}
+            self._extras[name] = value
+        else:
+            self.values[i] = value
+            self._written.add(name)
+
+    def update(self, features: dict):
+        for name, value in features.items():
+            self[name] = value
+
+    def clear(self):
+        self.values.fill(MISSING_FEATURE_VALUE)
+        self._written.clear()
+        self._extras = None
+
+    def __getitem__(self, name: str):
+        if name in self._written:
+            value = float(self.values[self.schema.index[name]])
+            return int(value) if value.is_integer() else value
+        if self._extras is not None and name in self._extras:
+            return self._extras[name]
+        raise KeyError(name)
+
+    def __iter__(self):
+        for name in self.schema.names:
+            if name in self._written:
+                yield name
+        if self._extras is not None:
+            yield from self._extras
+
+    def __len__(self):
+        return len(self._written) + (len(self._extras) if self._extras else 0)
+
+    def to_dict(self) -> dict:
+        return dict(self.items())
+
+    def model_input(self):
+        """1-row matrix for predict_proba; NaN/inf become the missing value like before."""
+        self.values[~np.isfinite(self.values)] = MISSING_FEATURE_VALUE
+        return self.values.reshape(1, -1)
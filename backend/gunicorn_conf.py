@@ -0,0 +1,41 @@
+# gunicorn_conf.py
+# Production serving mode: several uvicorn worker processes forked from one master.
+#
+#   cd backend && gunicorn -c gunicorn_conf.py main_api:app
+#
+# The master loads the model once before forking, so every worker shares its memory
+# copy-on-write instead of holding its own copy. Verdicts, progressive analyses and
+# metrics snapshots go through a SQLite file all workers share, so a poll or scrape
+# may land on any worker; WHOIS records and registry rate limits always do
+# (whois_cache.py, registry_guard.py). (`python main_api.py` is still the
+# single-process dev server with auto-reload.)
+import gc
+import multiprocessing
+import os
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_PATH = "models/phishing_model.joblib"
+
+# Must be set before main_api is imported (preload below), so the caches pick it up.
+os.environ.setdefault("PHISHEYE_SHARED_CACHE", os.path.join(tempfile.gettempdir(), "phisheye_cache.sqlite3"))
+
+chdir = BACKEND_DIR
+bind = os.environ.get("PHISHEYE_BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("PHISHEYE_WORKERS", multiprocessing.cpu_count()))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True  # Import main_api in the master so the model can be loaded before fork
+timeout = 60
+graceful_timeout = 30
+
+def on_starting(server):
+    """Runs once in the master, after the app is imported and before any worker forks."""
+    from ml_handler import init_ml_handler, warmup_ml_handler
+    server.log.info("Loading ML model in the master process before forking workers")
+    if not init_ml_handler(model_path=MODEL_PATH):
+        server.log.error("Machine Learning Model could not be loaded; workers will retry lazily.")
+    else:
+        warmup_ml_handler()  # Workers inherit the warm state and are ready immediately
+    # Move everything loaded so far out of the GC's reach: collections in the workers
+    # would otherwise touch these objects and un-share their memory pages.
+    gc.freeze()
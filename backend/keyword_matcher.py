@@ -0,0 +1,76 @@
+# keyword_matcher.py
+import os
+from collections import deque
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+def load_terms(filename: str) -> list:
+    """
+    Reads a term list from backend/data: one term per line, blank lines and '#'
+    comments ignored, lower-cased, duplicates dropped (file order kept).
+    """
+    path = filename if os.path.isabs(filename) else os.path.join(DATA_DIR, filename)
+    with open(path, encoding="utf-8") as f:
+        terms = (line.split('#', 1)[0].strip().lower() for line in f)
+        return list(dict.fromkeys(term for term in terms if term))
+
+class KeywordMatcher:
+    """
+    Aho-Corasick automaton over several named term lists. One pass over a text
+    reports every occurrence of every term (overlapping ones included), so the
+    cost per URL depends on the URL's length, not on how many terms are loaded.
+    """
+
+    def __init__(self, terms_by_category: dict):
+        self.categories = {category: list(terms) for category, terms in terms_by_category.items()}
+        self._goto = [{}]      # state -> {char: next state}
+        self._fail = [0]       # state -> longest proper suffix state
+        self._outputs = [()]   # state -> ((category, term), ...) ending here
+        for category, terms in self.categories.items():
+            for term in terms:
+                if term:
+                    self._add(category, term)
+        self._build_failure_links()
+
+    def _add(self, category: str, term: str):
+        state = 0
+        for char in term:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._outputs.append(())
+            state = next_state
+        self._outputs[state] += ((category, term),)
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                # Terms ending at the suffix state also end here
+                self._outputs[next_state] += self._outputs[self._fail[next_state]]
+
+    def find_all(self, text: str) -> list:
+        """Every match in text as (start, end, category, term), in order of end position."""
+        goto, fail, outputs = self._goto, self._fail, self._outputs
+        matches = []
+        state = 0
+        for end, char in enumerate(text, 1):
+            next_state = goto[state].get(char)
+            while next_state is None and state:
+                state = fail[state]
+                next_state = goto[state].get(char)
+            state = next_state or 0
+            if outputs[state]:
+                for category, term in outputs[state]:
+                    matches.append((end - len(term), end, category, term))
+        return matches
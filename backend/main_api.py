@@ -1,27 +1,71 @@
 # main_api.py (FINAL VERSION with modern lifespan event)
+import asyncio
+import json
+import os
 import uvicorn
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Request, HTTPException
 from pydantic import BaseModel, HttpUrl
-from typing import Optional
+from typing import Optional, List
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, PlainTextResponse
 from contextlib import asynccontextmanager # <-- NEW IMPORT
 
-from orchestrator import orchestrate_url_analysis 
-from ml_handler import init_ml_handler 
+from orchestrator import (orchestrate_url_analysis_async, orchestrate_batch_analysis, shutdown_analysis_pool,
+                          start_progressive_analysis, check_batch_admission, scheduler,
+                          AnalysisOverloadedError, BATCH_MAX_URLS, PRIORITY_INTERACTIVE)
+from analysis_store import analysis_store
+from verdict_cache import verdict_cache
+from registry_guard import registry_guard
+from metrics import REGISTRY, CallbackMetric, HTTP_IN_FLIGHT, WHOIS_CACHE_LOOKUPS
+from shared_cache import open_shared_cache
+from ml_handler import init_ml_handler, warmup_ml_handler, is_ml_handler_ready
 
 # --- 1. DEFINE THE NEW LIFESPAN FUNCTION ---
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    # Code to run on startup
-    print("--- [API SERVER] Lifespan event: Triggering ML Model Load ---")
+def _load_and_warm_model():
     success = init_ml_handler(model_path="models/phishing_model.joblib")
     if not success:
         print("--- [API SERVER] FATAL ERROR: Machine Learning Model could not be loaded. ---")
+        return
+    warmup_ml_handler()
+    print("--- [API SERVER] Model loaded and warm: /ready is now true. ---")
+
+# Multi-worker mode: each worker publishes its metrics here so any worker can serve
+# all of them on /metrics (a scrape lands on a random worker).
+METRICS_PUBLISH_SECONDS = 5
+_shared_metrics = open_shared_cache('metrics')
+
+def _publish_metrics():
+    # Entries of workers that died expire after a few missed publishes
+    _shared_metrics.set(str(os.getpid()), REGISTRY.collect(), METRICS_PUBLISH_SECONDS * 3)
+
+async def _publish_metrics_forever():
+    while True:
+        await asyncio.to_thread(_publish_metrics)
+        await asyncio.sleep(METRICS_PUBLISH_SECONDS)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Code to run on startup. The model loads in the background so the server binds
+    # right away; /ready reports when it can take analysis traffic.
+    print("--- [API SERVER] Lifespan event: Triggering ML Model Load ---")
+    model_loader = asyncio.create_task(asyncio.to_thread(_load_and_warm_model))
+    metrics_publisher = asyncio.create_task(_publish_metrics_forever()) if _shared_metrics else None
     
     yield # The API is running at this point
     
     # Code to run on shutdown
     print("--- [API SERVER] Lifespan event: Shutting down. ---")
+    if metrics_publisher is not None:
+        metrics_publisher.cancel()
+    shutdown_analysis_pool()
+    # Stop waiting for a load still in progress (its thread finishes on its own)
+    model_loader.cancel()
+    try:
+        await model_loader
+    except asyncio.CancelledError:
+        pass
+    except Exception as e:
+        print(f"--- [API SERVER] Model loading failed: {e} ---")
 
 # --- 2. CREATE THE APP AND CONNECT THE LIFESPAN FUNCTION ---
 app = FastAPI(
@@ -41,19 +85,139 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# --- METRICS: scrape-time views of caches and queues ---
+def _ratio(hits, misses):
+    return hits / (hits + misses) if hits + misses else 0.0
+
+def _whois_cache_hit_ratio():
+    return _ratio(WHOIS_CACHE_LOOKUPS.get('hit'), WHOIS_CACHE_LOOKUPS.get('miss'))
+
+REGISTRY.register(CallbackMetric('phisheye_verdict_cache_lookups_total', 'Verdict cache lookups by result.',
+                                 lambda: {('hit',): verdict_cache.hits, ('miss',): verdict_cache.misses},
+                                 metric_type='counter', label_names=('result',)))
+REGISTRY.register(CallbackMetric('phisheye_verdict_cache_hit_ratio', 'Verdict cache hits / lookups since start.',
+                                 lambda: _ratio(verdict_cache.hits, verdict_cache.misses)))
+REGISTRY.register(CallbackMetric('phisheye_verdict_cache_entries', 'Reports currently held in the verdict cache.',
+                                 lambda: verdict_cache.stats()['entries']))
+REGISTRY.register(CallbackMetric('phisheye_whois_cache_hit_ratio', 'WHOIS cache hits / lookups since start.',
+                                 _whois_cache_hit_ratio))
+REGISTRY.register(CallbackMetric('phisheye_whois_open_circuits', 'Registries (TLDs) whose WHOIS circuit breaker is not closed.',
+                                 lambda: len(registry_guard.open_circuits())))
+REGISTRY.register(CallbackMetric('phisheye_analyses_in_flight', 'Analyses running on the pool, by priority class.',
+                                 lambda: {(name,): c['running'] for name, c in scheduler.stats().items()},
+                                 label_names=('priority',)))
+REGISTRY.register(CallbackMetric('phisheye_analyses_queued', 'Analyses waiting for a slot, by priority class.',
+                                 lambda: {(name,): c['waiting'] for name, c in scheduler.stats().items()},
+                                 label_names=('priority',)))
+REGISTRY.register(CallbackMetric('phisheye_analyses_rejected_total', 'Analyses rejected with 429, by priority class.',
+                                 lambda: {(name,): c['rejected'] for name, c in scheduler.stats().items()},
+                                 metric_type='counter', label_names=('priority',)))
+
+@app.middleware("http")
+async def track_in_flight_requests(request: Request, call_next):
+    with HTTP_IN_FLIGHT.track_in_progress():
+        return await call_next(request)
+
 # --- (Your endpoint code remains exactly the same) ---
 class URLRequest(BaseModel):
     url: HttpUrl
     screenshot_base64: Optional[str] = None
 
+class BatchURLRequest(BaseModel):
+    urls: List[str]
+
 @app.get("/", tags=["Health Check"])
 def health_check():
     return {"status": "PhishEye Zero-Day Hunter API is active!"}
 
+def _overloaded(error: AnalysisOverloadedError) -> HTTPException:
+    """Fast rejection with a Retry-After hint instead of piling up latency."""
+    return HTTPException(status_code=429, detail=str(error),
+                         headers={"Retry-After": str(error.retry_after)})
+
+@app.get("/ready", tags=["Health Check"])
+def readiness_check():
+    """Readiness probe: 200 only once the model is loaded and warmed up (503 before)."""
+    if not is_ml_handler_ready():
+        raise HTTPException(status_code=503, detail="Model is still loading.")
+    return {"ready": True}
+
+@app.get("/metrics", tags=["Health Check"])
+def metrics_endpoint():
+    """
+    Prometheus text exposition: per-stage latency histograms, cache ratios, WHOIS errors,
+    in-flight gauges. Under gunicorn every worker's series, with a worker label.
+    """
+    if _shared_metrics is None:
+        return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+    _publish_metrics()  # This worker's own series are always current
+    return PlainTextResponse(REGISTRY.render(dict(_shared_metrics.items())), media_type="text/plain; version=0.0.4")
+
 @app.post("/api/v1/analyze", tags=["Core Analysis"])
-async def analyze_url_endpoint(request: URLRequest):
-    report = orchestrate_url_analysis(str(request.url))
+async def analyze_url_endpoint(request: URLRequest, priority: str = PRIORITY_INTERACTIVE):
+    """priority is 'interactive' (default, browser extension) or 'bulk' (scripted scans)."""
+    if not scheduler.has_class(priority):
+        raise HTTPException(status_code=422, detail=f"Unknown priority '{priority}'.")
+    try:
+        report = await orchestrate_url_analysis_async(str(request.url), request.screenshot_base64, priority)
+    except AnalysisOverloadedError as e:
+        raise _overloaded(e)
     return report
 
+@app.post("/api/v1/analyze/batch", tags=["Core Analysis"])
+async def analyze_batch_endpoint(request: BatchURLRequest):
+    """Streams one JSON report per line (NDJSON) as each URL finishes."""
+    if not request.urls:
+        raise HTTPException(status_code=422, detail="urls must not be empty.")
+    if len(request.urls) > BATCH_MAX_URLS:
+        raise HTTPException(status_code=413, detail=f"At most {BATCH_MAX_URLS} URLs per batch.")
+    try:
+        check_batch_admission()
+    except AnalysisOverloadedError as e:
+        raise _overloaded(e)
+
+    async def ndjson_lines():
+        async for report in orchestrate_batch_analysis(request.urls):
+            yield json.dumps(report) + "\n"
+
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
+@app.post("/api/v1/analyze/progressive", tags=["Core Analysis"])
+async def analyze_progressive_endpoint(request: URLRequest):
+    """
+    Answers immediately with a lexical-only score and an analysis_id. The enriched
+    verdict is then available from /api/v1/analysis/{analysis_id} (poll) or
+    /api/v1/analysis/{analysis_id}/events (server-sent events).
+    """
+    try:
+        record = await start_progressive_analysis(str(request.url))
+    except AnalysisOverloadedError as e:
+        raise _overloaded(e)
+    return record.to_dict()
+
+async def _get_analysis_or_404(analysis_id: str):
+    record = await analysis_store.get(analysis_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired analysis_id.")
+    return record
+
+@app.get("/api/v1/analysis/{analysis_id}", tags=["Core Analysis"])
+async def get_analysis_endpoint(analysis_id: str):
+    return (await _get_analysis_or_404(analysis_id)).to_dict()
+
+@app.get("/api/v1/analysis/{analysis_id}/events", tags=["Core Analysis"])
+async def analysis_events_endpoint(analysis_id: str):
+    """SSE stream: a 'lexical' event right away, then 'complete' or 'failed'."""
+    record = await _get_analysis_or_404(analysis_id)
+
+    async def event_stream():
+        yield f"event: lexical\ndata: {json.dumps(record.lexical)}\n\n"
+        await record.wait()
+        yield f"event: {record.status}\ndata: {json.dumps(record.to_dict())}\n\n"
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache"})
+
 if __name__ == "__main__":
+    # Single-process dev server. For production use: gunicorn -c gunicorn_conf.py main_api:app
     uvicorn.run("main_api:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
@@ -0,0 +1,200 @@
+# metrics.py
+# Minimal Prometheus-style metrics (text exposition format 0.0.4), no extra dependency.
+# Pipeline stages record into the metrics below; main_api serves REGISTRY.render() on /metrics
+# (under gunicorn, the merged snapshots of all workers, labelled by worker).
+import threading
+import time
+from contextlib import contextmanager
+
+# Latency buckets in seconds: sub-millisecond lexical work up to multi-second WHOIS
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _format_labels(label_names: tuple, label_values: tuple, extra: str = '') -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(label_names, label_values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _add_label(sample_name: str, pair: str) -> str:
+    if sample_name.endswith('}'):
+        return sample_name[:-1] + ',' + pair + '}'
+    return sample_name + '{' + pair + '}'
+
+def _format_value(value) -> str:
+    return repr(float(value)) if value != float('inf') else '+Inf'
+
+class Counter:
+    """Monotonic counter, optionally split by one or more labels."""
+    metric_type = 'counter'
+
+    def __init__(self, name: str, documentation: str, label_names: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount: float = 1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def get(self, *label_values) -> float:
+        with self._lock:
+            return self._values.get(label_values, 0)
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for label_values, value in values.items():
+            yield self.name + _format_labels(self.label_names, label_values), value
+
+class Gauge(Counter):
+    """Value that can go up and down (in-flight requests, queue depth)."""
+    metric_type = 'gauge'
+
+    def dec(self, *label_values, amount: float = 1):
+        self.inc(*label_values, amount=-amount)
+
+    def set(self, *label_values, value: float):
+        with self._lock:
+            self._values[label_values] = value
+
+    @contextmanager
+    def track_in_progress(self, *label_values):
+        self.inc(*label_values)
+        try:
+            yield
+        finally:
+            self.dec(*label_values)
+
+class CallbackMetric:
+    """
+    Metric read from elsewhere at scrape time (cache stats, scheduler queues).
+    fn returns either a number or a {label_values_tuple: number} dict.
+    """
+
+    def __init__(self, name: str, documentation: str, fn, metric_type: str = 'gauge', label_names: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.metric_type = metric_type
+        self.label_names = label_names
+        self._fn = fn
+
+    def samples(self):
+        values = self._fn()
+        if not isinstance(values, dict):
+            values = {(): values}
+        for label_values, value in values.items():
+            yield self.name + _format_labels(self.label_names, label_values), value
+
+class Histogram:
+    """Cumulative-bucket latency histogram, optionally split by labels."""
+    metric_type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, label_names: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        self._series = {}  # label_values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, *label_values, value: float):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+            for i, upper_bound in enumerate(self.buckets):
+                if value <= upper_bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, *label_values):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(*label_values, value=time.perf_counter() - started)
+
+    def samples(self):
+        with self._lock:
+            series_copy = {key: list(series) for key, series in self._series.items()}
+        for label_values, series in series_copy.items():
+            for i, upper_bound in enumerate(self.buckets):
+                le = 'le="' + _format_value(upper_bound) + '"'
+                yield self.name + '_bucket' + _format_labels(self.label_names, label_values, le), series[i]
+            yield self.name + '_sum' + _format_labels(self.label_names, label_values), series[-2]
+            yield self.name + '_count' + _format_labels(self.label_names, label_values), series[-1]
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def collect(self) -> list:
+        """This process's samples as JSON-friendly [name, documentation, type, [[sample, value]...]] entries."""
+        return [[metric.name, metric.documentation, metric.metric_type,
+                 [[sample_name, value] for sample_name, value in metric.samples()]]
+                for metric in self._metrics]
+
+    def render(self, workers: dict = None) -> str:
+        """
+        Text exposition of this process's metrics or, given {worker id: collect()} from
+        every worker process, of all of them with each sample labelled by its worker.
+        """
+        if workers is None:
+            workers = {None: self.collect()}
+        metrics = {}  # name -> (documentation, type, samples), in registration order
+        for worker, collected in workers.items():
+            for name, documentation, metric_type, samples in collected:
+                if worker is not None:
+                    samples = [(_add_label(sample_name, f'worker="{worker}"'), value) for sample_name, value in samples]
+                metrics.setdefault(name, (documentation, metric_type, []))[2].extend(samples)
+        lines = []
+        for name, (documentation, metric_type, samples) in metrics.items():
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for sample_name, value in samples:
+                lines.append(f"{sample_name} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+REGISTRY = MetricsRegistry()
+
+# --- CORE METRICS (other modules record into these) ---
+STAGE_LATENCY = REGISTRY.register(Histogram(
+    'phisheye_stage_duration_seconds',
+    'Latency of each analysis stage (feature_extraction, whois, model_inference, content_fetch).',
+    ('stage',)))
+ANALYSIS_LATENCY = REGISTRY.register(Histogram(
+    'phisheye_analysis_duration_seconds',
+    'End-to-end latency of an uncached URL analysis.'))
+WHOIS_ERRORS = REGISTRY.register(Counter(
+    'phisheye_whois_errors_total',
+    'Failed WHOIS lookups by error type (the whois_* feature flags, plus overloaded).',
+    ('error_type',)))
+WHOIS_CACHE_LOOKUPS = REGISTRY.register(Counter(
+    'phisheye_whois_cache_lookups_total',
+    'WHOIS cache lookups by result (hit/miss).',
+    ('result',)))
+WHOIS_CACHE_EVICTIONS = REGISTRY.register(Counter(
+    'phisheye_whois_cache_evictions_total',
+    'WHOIS records dropped from process memory, by reason (capacity/expired).',
+    ('reason',)))
+WHOIS_CACHE_ENTRIES = REGISTRY.register(Gauge(
+    'phisheye_whois_cache_entries',
+    'WHOIS records currently held in process memory.'))
+WHOIS_THROTTLED = REGISTRY.register(Counter(
+    'phisheye_whois_throttled_total',
+    'WHOIS lookups refused by the registry guard, by reason (rate_limited/circuit_open).',
+    ('reason',)))
+WHOIS_CIRCUIT_OPENS = REGISTRY.register(Counter(
+    'phisheye_whois_circuit_opens_total',
+    'Times a registry circuit breaker opened after repeated quota/timeout errors.'))
+HTTP_IN_FLIGHT = REGISTRY.register(Gauge(
+    'phisheye_http_requests_in_flight',
+    'HTTP requests currently being handled.'))
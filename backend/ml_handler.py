@@ -1,8 +1,12 @@
 # ml_handler.py
-import joblib
-import pandas as pd
+import threading
+import warnings
 from pathlib import Path
 from feature_extractor_1 import FeatureExtractor  # Use the fast one!
+from metrics import STAGE_LATENCY
+
+# Predictions pass a plain float32 row in the model's column order instead of a DataFrame
+warnings.filterwarnings("ignore", message="X does not have valid feature names", category=UserWarning)
 
 class MLHandler:
     def __init__(self, model_path: str = "ML/models/phishing_model.joblib", enable_whois=True):
@@ -10,11 +14,23 @@ class MLHandler:
         self.model = None
         self.feature_extractor = None
         self.feature_names = None
+        self.schema = None
         self.is_loaded = False
         self.enable_whois = enable_whois  # Add this
+        self.is_warm = False
+        self._load_lock = threading.Lock()
         
     def load_model(self):
-        """Load the trained model and feature extractor"""
+        """Load the trained model and feature extractor (once, even if called concurrently)"""
+        with self._load_lock:
+            if self.is_loaded:
+                return True
+            return self._load_model()
+    
+    def _load_model(self):
+        # Heavy imports (joblib pulls in sklearn/numpy) stay off the API startup path
+        import joblib
+        from feature_schema import FeatureSchema
         try:
             if not self.model_path.exists():
                 raise FileNotFoundError(f"Model file not found: {self.model_path}")
@@ -23,7 +39,8 @@ class MLHandler:
             model_payload = joblib.load(self.model_path)
             
             self.model = model_payload['model']
-            self.feature_names = model_payload.get('feature_names', [])
+            self.feature_names = list(model_payload.get('feature_names', []))
+            self.schema = FeatureSchema(self.feature_names)
             # Use WHOIS-enabled extractor
             self.feature_extractor = FeatureExtractor(enable_whois=self.enable_whois)
             self.is_loaded = True
@@ -40,9 +57,15 @@ class MLHandler:
             self.is_loaded = False
             return False
     
-    def predict_url(self, url: str) -> dict:
+    def predict_url(self, url: str, use_whois: bool = True, extra_features=(),
+                    whois_rate_limit_wait: float = 0.0) -> dict:
         """
-        Main prediction function - called by browser extension and backend
+        Main prediction function - called by browser extension and backend.
+        use_whois=False skips the network lookup for a fast, lexical-only score.
+        Only the feature tiers the model (and extra_features, read by the caller)
+        needs are computed: a model trained without WHOIS never triggers a lookup.
+        whois_rate_limit_wait: seconds the WHOIS lookup may queue for the registry's
+        rate limit (0 = degrade at once, for interactive callers).
         """
         if not self.is_loaded:
             success = self.load_model()
@@ -50,14 +73,13 @@ class MLHandler:
                 return self._error_response("Model not loaded")
         
         try:
-            # Extract features using FAST extractor (no WHOIS)
-            features_dict = self.feature_extractor.extract_features(url)
+            # Features are written straight into a float32 row in the model's column order
+            features = self.feature_extractor.extract_feature_vector(url, self.schema, use_whois=use_whois,
+                                                                     extra_features=extra_features,
+                                                                     whois_rate_limit_wait=whois_rate_limit_wait)
             
-            # Convert to proper format for model
-            features_df = self._prepare_features(features_dict)
-            
-            # Make prediction
-            probability = self.model.predict_proba(features_df)[0][1]
+            with STAGE_LATENCY.time('model_inference'):
+                probability = self.model.predict_proba(features.model_input())[0][1]
             threat_score = int(probability * 100)
             
             # Generate verdict
@@ -70,8 +92,8 @@ class MLHandler:
                 'action': action,
                 'confidence': round(probability, 3),
                 'url': url,
-                'features_analyzed': len(features_dict),
-                'features': features_dict, # <-- ADD THIS LINE
+                'features_analyzed': len(features),
+                'features': features,  # Read-only mapping; features.to_dict() for a plain dict
                 'model_loaded': True
             }
             
@@ -79,6 +101,28 @@ class MLHandler:
             print(f"Prediction error for {url}: {e}")
             return self._error_response(str(e))
     
+    def warmup(self, rounds: int = 3) -> bool:
+        """
+        Run a few synthetic lexical-only predictions so the first real request does not
+        pay for sklearn/pandas/numpy lazy initialisation. No network calls are made.
+        """
+        if self.is_warm:
+            return True
+        if not self.load_model():
+            return False
+        synthetic_urls = [
+            "https://www.example.com/",
+            "http://secure-login.example-verify.tk/account/update?id=12345&session=abc",
+            "http://192.168.0.1/paypal/signin.php",
+        ]
+        for _ in range(rounds):
+            for url in synthetic_urls:
+                if not self.predict_url(url, use_whois=False).get('success'):
+                    return False
+        self.is_warm = True
+        print("Model warmed up.")
+        return True
+    
     def predict_batch(self, urls: list) -> list:
         """Predict multiple URLs at once (for dashboard/analytics)"""
         results = []
@@ -99,42 +143,22 @@ class MLHandler:
             'is_fitted': hasattr(self.model, 'classes_')
         }
     
-    def _prepare_features(self, features_dict: dict) -> pd.DataFrame:
-        """Convert features dictionary to model input format"""
-        # Ensure all expected features are present
-        features_df = pd.DataFrame([features_dict])
-        
-        # Add missing features with default values
-        for feature in self.feature_names:
-            if feature not in features_df.columns:
-                features_df[feature] = -1  # Default for missing
-        
-        # Reorder columns to match training
-        features_df = features_df[self.feature_names]
-        
-        # Handle NaN/infinite values
-        features_df = features_df.fillna(-1)
-        features_df = features_df.replace([float('inf'), float('-inf')], -1)
-        
-        return features_df
-    
     def get_feature_analysis(self, url: str) -> dict:
         """Get detailed feature analysis for a URL"""
         if not self.is_loaded:
             self.load_model()
 
-        features_dict = self.feature_extractor.extract_features(url)
-        features_df = self._prepare_features(features_dict)
+        features = self.feature_extractor.extract_feature_vector(url, self.schema)
+        feature_row = features.model_input()[0]
 
         # Get feature importances and calculate contributions
         importances = self.model.feature_importances_
-        feature_row = features_df.iloc[0]
     
         contributions = []
         for i, feature_name in enumerate(self.feature_names):
             if i < len(importances):
                 importance = importances[i]
-                value = feature_row[feature_name]
+                value = float(feature_row[i])
 
                 # Calculate contribution
                 if feature_name in ['has_ip', 'has_shortening', 'whois_lookup_failed']:
@@ -153,7 +177,7 @@ class MLHandler:
         contributions.sort(key=lambda x: abs(x['contribution']), reverse=True)
     
         return {
-            'features': features_dict,
+            'features': features.to_dict(),
             'contributions': contributions,
             'top_contributors': contributions[:5]
         }
@@ -185,10 +209,22 @@ ml_handler = MLHandler()
 def init_ml_handler(model_path: str = None):
     """Initialize the ML handler (call this at app startup)"""
     global ml_handler
-    if model_path:
+    if model_path and Path(model_path) != ml_handler.model_path:
         ml_handler = MLHandler(model_path)
+    if ml_handler.is_loaded:
+        # Already loaded, e.g. by the gunicorn master before forking the workers
+        return True
     return ml_handler.load_model()
 
-def predict_url(url: str):
+def warmup_ml_handler() -> bool:
+    """Load (if needed) and warm up the model; True once it is ready for traffic."""
+    return ml_handler.warmup()
+
+def is_ml_handler_ready() -> bool:
+    """Readiness: model loaded and warmed up."""
+    return ml_handler.is_loaded and ml_handler.is_warm
+
+def predict_url(url: str, use_whois: bool = True, extra_features=(), whois_rate_limit_wait: float = 0.0):
     """Convenience function for single URL prediction"""
-    return ml_handler.predict_url(url)
\ No newline at end of file
+    return ml_handler.predict_url(url, use_whois=use_whois, extra_features=extra_features,
+                                  whois_rate_limit_wait=whois_rate_limit_wait)
\ No newline at end of file
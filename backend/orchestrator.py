@@ -1,7 +1,62 @@
 # orchestrator.py (FINAL VERSION - SYNCHRONIZED WITH ml_handler.py AND UI)
 
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as StageTimeoutError
+
 from ml_handler import predict_url
 from content_analyzer import analyze_page_content
+from url_utils import group_urls_by_host, normalize_url
+from verdict_cache import verdict_cache
+from single_flight import SingleFlight, AsyncSingleFlight
+from analysis_store import analysis_store
+from metrics import ANALYSIS_LATENCY
+from feature_registry import TIER_CONTENT, tiers_for
+from whois_cache import WHOIS_SKIPPED
+from scheduler import (AnalysisScheduler, PriorityClass, AnalysisOverloadedError,
+                       PRIORITY_INTERACTIVE, PRIORITY_BULK)
+
+# --- ASYNC EXECUTION SETTINGS ---
+# The pipeline is blocking (requests, WHOIS, retries with sleep), so the API runs it
+# on a bounded thread pool instead of on the event loop. The pool is split between
+# priority classes so bulk scans cannot starve interactive lookups.
+INTERACTIVE_CONCURRENCY = 48  # Extension lookups running at the same time
+INTERACTIVE_MAX_QUEUE = 256   # Waiting extension lookups before we answer 429
+BULK_CONCURRENCY = 16         # Batch/scan analyses running at the same time
+BULK_MAX_QUEUE = 64           # Waiting bulk analyses before new batches get 429
+ANALYSIS_WORKERS = INTERACTIVE_CONCURRENCY + BULK_CONCURRENCY
+
+ANALYSIS_DEADLINE_SECONDS = 6.0  # Latency budget shared by the ML and live-content stages
+# Seconds a bulk analysis's WHOIS lookup may queue for the registry rate limit (see
+# registry_guard) instead of degrading at once like interactive lookups do
+BULK_WHOIS_RATE_LIMIT_WAIT = 3.0
+
+# Features the full report reads besides the model's own (highlights and UI params).
+# Their cost tiers decide which network stages a full analysis runs.
+REPORT_FEATURE_NAMES = ('url_length', 'domain_age', 'domain_lifespan', 'form_action_is_external')
+REPORT_TIERS = tiers_for(REPORT_FEATURE_NAMES)
+
+BATCH_MAX_URLS = 10000        # Largest batch accepted by /api/v1/analyze/batch
+BATCH_HOST_CONCURRENCY = 16   # Hosts of one batch analysed at the same time
+BATCH_PER_HOST_CONCURRENCY = 4  # URLs of one host analysed at the same time (after the first)
+
+_analysis_pool = ThreadPoolExecutor(max_workers=ANALYSIS_WORKERS, thread_name_prefix="analysis")
+# Each analysis fans out into two stages; stages that miss the deadline keep running
+# here in the background until their own network timeouts fire. Every priority class
+# has its own stage pool, so stalled bulk stages cannot delay interactive ones.
+_stage_pools = {
+    PRIORITY_INTERACTIVE: ThreadPoolExecutor(max_workers=INTERACTIVE_CONCURRENCY * 2,
+                                             thread_name_prefix="interactive-stage"),
+    PRIORITY_BULK: ThreadPoolExecutor(max_workers=BULK_CONCURRENCY * 2, thread_name_prefix="bulk-stage"),
+}
+scheduler = AnalysisScheduler(_analysis_pool, [
+    PriorityClass(PRIORITY_INTERACTIVE, INTERACTIVE_CONCURRENCY, INTERACTIVE_MAX_QUEUE),
+    PriorityClass(PRIORITY_BULK, BULK_CONCURRENCY, BULK_MAX_QUEUE),
+])
+
+# Concurrent requests for the same normalized URL (and priority class) share one analysis.
+_analysis_flights = SingleFlight()
+_async_analysis_flights = AsyncSingleFlight()
 
 def _create_ui_params(features: dict, ml_confidence: float) -> list:
     """Helper to translate raw features into the 'params' array for the UI."""
@@ -20,24 +75,40 @@ def _create_ui_params(features: dict, ml_confidence: float) -> list:
     ui_params.append({'key': 'ML Model Confidence', 'value': int(ml_confidence * 100)})
     return ui_params
 
-def orchestrate_url_analysis(url: str, screenshot_base64: str = None):
+def _wait_for_stage(future, deadline: float):
+    """Returns the stage result, or None if it did not finish before the deadline."""
+    try:
+        return future.result(timeout=max(0.0, deadline - time.monotonic()))
+    except StageTimeoutError:
+        return None
+
+def orchestrate_url_analysis(url: str, screenshot_base64: str = None, whois_rate_limit_wait: float = 0.0,
+                             priority: str = PRIORITY_INTERACTIVE):
     """
     Main workflow: gets the ML report, enriches it with content analysis,
-    and formats the final package for the UI.
+    and formats the final package for the UI. priority picks the stage pool.
     """
     print(f"\n--- [Orchestrator] Starting analysis for: {url} ---")
-    
-    # STEP 1: Get the complete ML prediction from your friend's handler.
-    # It now returns everything we need: verdict, score, and the features used.
-    ml_report = predict_url(url)
-    
-    if not ml_report.get('success', False):
-        return ml_report
+    cache_key = normalize_url(url)
+    cached_report = verdict_cache.get(cache_key)
+    if cached_report is not None:
+        print(f"--- [Orchestrator] Cache hit. Verdict: {cached_report['category']} ---")
+        return cached_report
 
-    # STEP 2: Get supplementary live content analysis.
-    content_features = analyze_page_content(url)
-    
-    # --- STEP 3: CONSTRUCT THE FINAL REPORT FOR THE UI ---
+    return _analyze_uncached(url, cache_key, whois_rate_limit_wait, priority)
+
+def _analyze_uncached(url: str, cache_key: str, whois_rate_limit_wait: float = 0.0,
+                      priority: str = PRIORITY_INTERACTIVE):
+    """orchestrate_url_analysis for callers that already missed the verdict cache (no second lookup)."""
+    # A campaign URL opened by hundreds of users at once is only analysed once per
+    # priority class: an interactive request never waits on a bulk run (bulk stage
+    # pool, bulk WHOIS wait) of the same URL.
+    return _analysis_flights.do((priority, cache_key), _analyze_url, url, cache_key, whois_rate_limit_wait,
+                                priority)
+
+def _build_report(url: str, ml_report: dict, content_features: dict, skipped_stages: list,
+                  preliminary: bool = False) -> dict:
+    """Turns the ML report and content features into the package the UI renders."""
     all_features = ml_report.get('features', {})
     
     highlights = []
@@ -50,14 +121,174 @@ def orchestrate_url_analysis(url: str, screenshot_base64: str = None):
         highlights.append("HIGH RISK: The URL's structure strongly matches known phishing patterns.")
     if not highlights:
         highlights.append("INSIGHT: No critical risk indicators found.")
+    if preliminary:
+        highlights.append("INSIGHT: Preliminary score from the URL structure; domain and page checks are still running.")
+    if 'ml' in skipped_stages:
+        highlights.append("INSIGHT: Domain registration lookup timed out; score is based on the URL structure only.")
+    if 'whois' in skipped_stages:
+        highlights.append("INSIGHT: Domain registration lookup was skipped (registry busy); domain age is unknown.")
+    if 'content' in skipped_stages:
+        highlights.append("INSIGHT: The live page did not respond in time and was not inspected.")
 
-    final_report = {
+    return {
         'url': url,
         'threatScore': ml_report.get('threat_score'),
         'category': ml_report.get('verdict'),
         'reasoning_highlights': highlights,
-        'params': _create_ui_params(all_features, ml_report.get('confidence', 0))
+        'params': _create_ui_params(all_features, ml_report.get('confidence', 0)),
+        'skipped_stages': skipped_stages
     }
+
+def _lexical_report(url: str) -> dict:
+    """Phase one of a progressive analysis: URL-structure-only score, no network calls."""
+    ml_report = predict_url(url, use_whois=False)
+    if not ml_report.get('success', False):
+        return ml_report
+    return _build_report(url, ml_report, {}, [], preliminary=True)
+
+def _analyze_url(url: str, cache_key: str, whois_rate_limit_wait: float = 0.0,
+                 priority: str = PRIORITY_INTERACTIVE):
+    """Runs the ML and content stages for a URL that is not in the verdict cache."""
+    with ANALYSIS_LATENCY.time():
+        return _run_analysis_stages(url, cache_key, whois_rate_limit_wait, priority)
+
+def _run_analysis_stages(url: str, cache_key: str, whois_rate_limit_wait: float = 0.0,
+                         priority: str = PRIORITY_INTERACTIVE):
+    deadline = time.monotonic() + ANALYSIS_DEADLINE_SECONDS
+    skipped_stages = []
+    stage_pool = _stage_pools[priority]
+
+    # STEP 1 + 2: Run the ML prediction (incl. WHOIS) and the live content analysis
+    # side by side, both bounded by the same deadline.
+    ml_future = stage_pool.submit(predict_url, url, True, REPORT_FEATURE_NAMES, whois_rate_limit_wait)
+    content_future = stage_pool.submit(analyze_page_content, url) if TIER_CONTENT in REPORT_TIERS else None
+
+    ml_report = _wait_for_stage(ml_future, deadline)
+    if ml_report is None:
+        # WHOIS is what makes this stage slow; fall back to a URL-structure-only score.
+        print("--- [Orchestrator] ML stage missed the deadline, using lexical-only score ---")
+        skipped_stages.append('ml')
+        ml_report = predict_url(url, use_whois=False)
+
+    if not ml_report.get('success', False):
+        return ml_report
+    if ml_report['features'].get(WHOIS_SKIPPED):
+        # The WHOIS pool or the registry guard refused the lookup: no registry data
+        skipped_stages.append('whois')
+
+    content_features = _wait_for_stage(content_future, deadline) if content_future else {}
+    if content_features is None:
+        print("--- [Orchestrator] Content stage missed the deadline, skipping it ---")
+        skipped_stages.append('content')
+        content_features = {}
     
+    # --- STEP 3: CONSTRUCT THE FINAL REPORT FOR THE UI ---
+    final_report = _build_report(url, ml_report, content_features, skipped_stages)
+
+    # Partial reports (a stage was skipped) are not cached so the next request retries them.
+    if not skipped_stages:
+        verdict_cache.put(cache_key, final_report)
+
     print(f"--- [Orchestrator] Analysis complete. Final Verdict: {final_report['category']} ---")
-    return final_report
\ No newline at end of file
+    return final_report
+
+async def orchestrate_url_analysis_async(url: str, screenshot_base64: str = None,
+                                         priority: str = PRIORITY_INTERACTIVE):
+    """
+    Non-blocking wrapper for the API: runs orchestrate_url_analysis on the bounded
+    analysis pool so one slow WHOIS or page fetch never freezes the event loop.
+    Cached verdicts are answered on the event loop without taking a pool slot, and
+    duplicate in-flight requests await the same run instead of queueing their own.
+    Raises AnalysisOverloadedError when the priority class's queue is full.
+    """
+    cache_key = normalize_url(url)
+    cached_report = await verdict_cache.get_async(cache_key)
+    if cached_report is not None:
+        return cached_report
+    whois_rate_limit_wait = BULK_WHOIS_RATE_LIMIT_WAIT if priority == PRIORITY_BULK else 0.0
+    return await _async_analysis_flights.do((priority, cache_key), scheduler.run, priority,
+                                            _analyze_uncached, url, cache_key, whois_rate_limit_wait, priority)
+
+async def start_progressive_analysis(url: str):
+    """
+    Progressive mode: returns a record holding the instant lexical-only report, while
+    the enriched (WHOIS + content) analysis keeps running in the background. Clients
+    poll the record or follow it over server-sent events.
+    """
+    cached_report = await verdict_cache.get_async(normalize_url(url))
+    if cached_report is not None:
+        record = analysis_store.create(url)
+        record.set_lexical(cached_report)
+        record.finish(cached_report)
+    else:
+        # The record is only created once the lexical phase got in: a 429 leaves nothing pending
+        lexical_report = await scheduler.run(PRIORITY_INTERACTIVE, _lexical_report, url)
+        record = analysis_store.create(url)
+        record.set_lexical(lexical_report)
+        record.task = asyncio.create_task(_enrich_progressive_analysis(record))
+    await record.published()  # The client may poll any worker as soon as it has the id
+    return record
+
+async def _enrich_progressive_analysis(record):
+    try:
+        record.finish(await orchestrate_url_analysis_async(record.url))
+    except AnalysisOverloadedError:
+        record.fail("Analysis queue is full; only the preliminary score is available.")
+    except Exception as e:
+        record.fail(str(e))
+
+def check_batch_admission():
+    """Raises AnalysisOverloadedError if the bulk queue cannot take another batch."""
+    scheduler.check_admission(PRIORITY_BULK)
+
+async def orchestrate_batch_analysis(urls: list):
+    """
+    Analyses a batch of URLs and yields each report as soon as it is ready.
+    URLs are de-duplicated and grouped by host. The first URL of a host runs alone,
+    so its WHOIS lookup is cached for the rest; the others then run at most
+    BATCH_PER_HOST_CONCURRENCY at a time so the site is not hammered. Different hosts
+    run in parallel. Runs in the bulk priority class; call check_batch_admission()
+    before starting the stream.
+    """
+    groups = group_urls_by_host(urls)
+    total = sum(len(host_urls) for host_urls in groups.values())
+    print(f"--- [Orchestrator] Batch of {len(urls)} URLs -> {total} unique across {len(groups)} hosts ---")
+
+    finished = asyncio.Queue()
+    host_slots = asyncio.Semaphore(BATCH_HOST_CONCURRENCY)
+
+    async def run_url(url, url_slots):
+        # Cached verdicts do not need a bulk slot
+        cache_key = normalize_url(url)
+        report = await verdict_cache.get_async(cache_key)
+        if report is None:
+            try:
+                # The batch was admitted as a whole and bounds itself via host_slots/url_slots.
+                async with url_slots:
+                    report = await scheduler.run(PRIORITY_BULK, _analyze_uncached, url, cache_key,
+                                                 BULK_WHOIS_RATE_LIMIT_WAIT, PRIORITY_BULK, admit=False)
+            except Exception as e:
+                report = {'success': False, 'error': str(e)}
+        report.setdefault('url', url)
+        await finished.put(report)
+
+    async def run_host(host_urls):
+        async with host_slots:
+            url_slots = asyncio.Semaphore(BATCH_PER_HOST_CONCURRENCY)
+            await run_url(host_urls[0], url_slots)  # Alone: warms the WHOIS cache for the rest
+            await asyncio.gather(*(run_url(url, url_slots) for url in host_urls[1:]))
+
+    tasks = [asyncio.create_task(run_host(host_urls)) for host_urls in groups.values()]
+    try:
+        for _ in range(total):
+            yield await finished.get()
+    finally:
+        # Client went away (or we are done): stop scheduling the remaining URLs.
+        for task in tasks:
+            task.cancel()
+
+def shutdown_analysis_pool():
+    """Stop accepting work and let running analyses finish (call at app shutdown)."""
+    _analysis_pool.shutdown(wait=False, cancel_futures=True)
+    for stage_pool in _stage_pools.values():
+        stage_pool.shutdown(wait=False, cancel_futures=True)
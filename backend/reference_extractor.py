@@ -0,0 +1,106 @@
+# reference_extractor.py
+# Frozen copy of the original FeatureExtractor (before the performance work), used by
+# benchmark.py as the parity reference for the scalar extract_features path. Keep it
+# as it is: do not optimize or fix it. Only the WHOIS lookup was removed.
+import re
+import math
+from urllib.parse import urlparse
+
+class ReferenceFeatureExtractor:
+    """The original lexical feature extraction, unchanged."""
+
+    def __init__(self):
+        self.phishing_keywords = {
+            'login', 'secure', 'account', 'update', 'verify', 'webscr', 'signin', 
+            'banking', 'confirm', 'ebayisapi', 'apple', 'microsoft', 'google', 
+            'paypal', 'amazon'
+        }
+        
+        self.trusted_domains = {
+            'github.com', 'gitlab.com', 'stackoverflow.com', 'wikipedia.org',
+            'microsoft.com', 'apple.com', 'google.com', 'amazon.com', 'paypal.com',
+            'facebook.com', 'youtube.com', 'reddit.com', 'instagram.com', 'linkedin.com',
+            'twitter.com', 'netflix.com', 'ebay.com', 'cnn.com', 'bbc.com', 'nytimes.com',
+            'chase.com', 'bankofamerica.com', 'wellsfargo.com', 'mozilla.org', 'adobe.com'
+        }
+        
+        self.suspicious_tlds = {'.tk', '.ml', '.ga', '.cf', '.gq', '.xyz', '.top', '.loan', '.club'}
+
+    def _calculate_entropy(self, text: str) -> float:
+        if not text: return 0.0
+        prob = [float(text.count(c)) / len(text) for c in dict.fromkeys(list(text))]
+        entropy = -sum([p * math.log(p) / math.log(2.0) for p in prob if p > 0])
+        return entropy
+
+    def _is_trusted_domain(self, domain: str) -> bool:
+        clean_domain = domain.lower().replace('www.', '')
+        return clean_domain in self.trusted_domains
+
+    def extract_features(self, url: str) -> dict:
+        try:
+            if not re.match(r'^https?://', url):
+                url = "http://" + url
+            
+            parsed_url = urlparse(url)
+            domain = parsed_url.netloc.lower()
+            path = parsed_url.path
+
+            if not domain:
+                raise ValueError("Could not parse domain/hostname from URL.")
+
+            features = {}
+            
+            # DOMAIN REPUTATION FEATURES
+            features['is_trusted_domain'] = 1 if self._is_trusted_domain(domain) else 0
+            features['suspicious_tld'] = 1 if any(domain.endswith(tld) for tld in self.suspicious_tlds) else 0
+            
+            # LENGTH FEATURES
+            features['url_length'] = len(url)
+            features['hostname_length'] = len(domain)
+            features['path_length'] = len(path)
+            features['fd_length'] = len(path.split('/')[-1])
+            
+            # CHARACTER PATTERNS
+            features['count-'] = url.count('-')
+            features['count@'] = url.count('@')
+            features['count?'] = url.count('?')
+            features['count%'] = url.count('%')
+            features['count.'] = url.count('.')
+            features['count='] = url.count('=')
+            features['count-http'] = url.count('http')
+            features['count-https'] = url.count('https')
+            features['count-www'] = url.count('www')
+            features['count-digits'] = sum(c.isdigit() for c in url)
+            features['count-letters'] = sum(c.isalpha() for c in url)
+            features['count-dir'] = path.count('/')
+            
+            # SECURITY INDICATORS
+            features['has_ip'] = 1 if re.match(r"^\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}(:\d+)?$", domain) else 0
+            features['has_shortening'] = 1 if re.search(r'bit\.ly|goo\.gl|shorte\.st|go2l\.ink|x\.co|ow\.ly|t\.co|tinyurl', url) else 0
+            
+            # KEYWORD ANALYSIS
+            features['keyword_count'] = sum(1 for keyword in self.phishing_keywords if keyword in url.lower())
+            
+            # ENTROPY
+            features['url_entropy'] = self._calculate_entropy(url)
+            features['domain_entropy'] = self._calculate_entropy(domain)
+            
+            # RATIO FEATURES
+            features['path_to_url_ratio'] = len(path) / len(url) if len(url) > 0 else 0
+            features['letters_to_length_ratio'] = sum(c.isalpha() for c in url) / len(url) if len(url) > 0 else 0
+            features['digits_to_length_ratio'] = sum(c.isdigit() for c in url) / len(url) if len(url) > 0 else 0
+            
+            # BRAND ANALYSIS
+            brand_keywords = ['paypal', 'apple', 'microsoft', 'google', 'amazon', 'ebay', 'bank']
+            features['has_brand_name'] = 1 if any(brand in url.lower() for brand in brand_keywords) else 0
+            features['brand_in_subdomain'] = 1 if any(brand in domain.lower().split('.')[0] for brand in brand_keywords) else 0
+            features['brand_not_in_domain'] = 1 if (features['has_brand_name'] == 1 and not any(brand in domain for brand in brand_keywords)) else 0
+            
+            # (WHOIS features removed: parity checks run without network calls)
+
+            return features
+
+        except Exception as e:
+            # Fallback in case of any catastrophic error
+            print(f"[Feature Extractor] CRITICAL ERROR processing {url}: {e}")
+            return { 'error': 1, 'domain_age': -1, 'domain_lifespan': -1 }
\ No newline at end of file
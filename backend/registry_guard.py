@@ -0,0 +1,220 @@
+# registry_guard.py
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from metrics import WHOIS_CIRCUIT_OPENS, WHOIS_THROTTLED
+from whois_cache import LOCAL_ERROR_FLAGS, whois_cache_path
+
+# Outcomes that mean the registry is pushing back on us
+TRIPPING_ERRORS = ('whois_quota_exceeded', 'whois_timeout')
+
+class TokenBucket:
+    """rate tokens per second, up to burst saved up. Not locked: RegistryGuard holds the lock."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.time()  # Wall clock: the state may be shared between processes
+
+    def try_acquire(self, now: float) -> bool:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+    def seconds_until_token(self) -> float:
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+class CircuitBreaker:
+    """
+    Opens after failure_threshold consecutive tripping failures. Once reset_timeout
+    has passed, a single trial lookup is let through (half-open): success closes the
+    breaker, another failure re-opens it for twice as long (up to max_reset_timeout).
+    Not locked: RegistryGuard holds the lock.
+    """
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, failure_threshold: int, reset_timeout: float, max_reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.base_reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+
+    def allow(self, now: float) -> bool:
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN and now - self.opened_at >= self.reset_timeout:
+            self.state = self.HALF_OPEN  # This caller is the trial
+            return True
+        return False
+
+    def record(self, failed, now: float) -> bool:
+        """failed: True/False, or None when the registry was never asked. Returns True if it opened."""
+        if failed is None:
+            if self.state == self.HALF_OPEN:
+                self.state = self.OPEN  # Trial did not happen; the next caller gets it
+            return False
+        if not failed:
+            self.state = self.CLOSED
+            self.failures = 0
+            self.reset_timeout = self.base_reset_timeout
+            return False
+        self.failures += 1
+        if self.state == self.HALF_OPEN:
+            self.reset_timeout = min(self.reset_timeout * 2, self.max_reset_timeout)
+        elif self.failures < self.failure_threshold:
+            return False
+        self.state = self.OPEN
+        self.opened_at = now
+        return True
+
+class RegistryGuard:
+    """
+    Per-registry (keyed by TLD) token bucket and circuit breaker in front of WHOIS
+    lookups. By default admit() never waits: a lookup the registry would not take
+    right now is refused at once, so interactive callers can answer from cache or with
+    degraded features. Callers that would rather be slow than degraded (training, bulk
+    scans) pass max_wait to queue for a token; an open circuit is refused either way.
+
+    With a path, the state lives in that SQLite file (the box-wide WHOIS cache), so
+    every API worker and training run on the box shares one rate limit and one breaker
+    per registry; each check is one short IMMEDIATE transaction. If the file cannot be
+    used, the guard falls back to limits of its own process.
+    """
+
+    def __init__(self, rate_per_second: float = 5.0, burst: float = 20, failure_threshold: int = 5,
+                 reset_timeout: float = 60.0, max_reset_timeout: float = 900.0, path=None):
+        self.rate_per_second = rate_per_second
+        self.burst = burst
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.path = str(path) if path else None
+        self._buckets = {}
+        self._breakers = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    # --- STATE (this process, or the shared file) ---
+    def _new_state(self) -> tuple:
+        return (TokenBucket(self.rate_per_second, self.burst),
+                CircuitBreaker(self.failure_threshold, self.reset_timeout, self.max_reset_timeout))
+
+    def _local_state(self, key: str) -> tuple:
+        if key not in self._buckets:
+            self._buckets[key], self._breakers[key] = self._new_state()
+        return self._buckets[key], self._breakers[key]
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=2, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS registry_guard (
+                    key TEXT PRIMARY KEY,
+                    tokens REAL NOT NULL,
+                    updated REAL NOT NULL,
+                    state TEXT NOT NULL,
+                    failures INTEGER NOT NULL,
+                    opened_at REAL NOT NULL,
+                    reset_timeout REAL NOT NULL
+                )""")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _update_shared(self, key: str, fn):
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            bucket, breaker = self._new_state()
+            row = conn.execute("SELECT tokens, updated, state, failures, opened_at, reset_timeout "
+                               "FROM registry_guard WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                bucket.tokens, bucket.updated = row[0], row[1]
+                breaker.state, breaker.failures, breaker.opened_at, breaker.reset_timeout = row[2:]
+            result = fn(bucket, breaker)
+            conn.execute("INSERT OR REPLACE INTO registry_guard VALUES (?, ?, ?, ?, ?, ?, ?)",
+                         (key, bucket.tokens, bucket.updated, breaker.state, breaker.failures,
+                          breaker.opened_at, breaker.reset_timeout))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return result
+
+    def _update(self, key: str, fn):
+        """fn(bucket, breaker) applied atomically to a registry's state; returns its result."""
+        with self._lock:
+            if self.path is not None:
+                try:
+                    return self._update_shared(key, fn)
+                except sqlite3.Error as e:
+                    print(f"[Registry Guard] Shared state unavailable, using this process's limits: {e}")
+            return fn(*self._local_state(key))
+
+    # --- ADMISSION ---
+    @staticmethod
+    def _try_admit(bucket: TokenBucket, breaker: CircuitBreaker) -> tuple:
+        now = time.time()
+        if not breaker.allow(now):
+            return 'circuit_open', 0.0
+        if bucket.try_acquire(now):
+            return None, 0.0
+        # A half-open trial that was rate limited must not hold the breaker hostage
+        breaker.record(None, now)
+        return 'rate_limited', bucket.seconds_until_token()
+
+    def admit(self, key: str, max_wait: float = 0.0):
+        """
+        None if a lookup may go to the registry now (after waiting up to max_wait
+        seconds for a token), else why not ('circuit_open'/'rate_limited').
+        """
+        waited = 0.0
+        while True:
+            reason, delay = self._update(key, self._try_admit)
+            if reason is None:
+                return None
+            if reason == 'circuit_open' or waited + delay > max_wait:
+                break
+            time.sleep(delay)
+            waited += delay
+        WHOIS_THROTTLED.inc(reason)
+        return reason
+
+    def record(self, key: str, error):
+        """Outcome of an admitted lookup: the WHOIS record's error (None = success)."""
+        if error in LOCAL_ERROR_FLAGS:
+            failed = None  # Never reached the registry
+        else:
+            failed = error in TRIPPING_ERRORS  # Not found, private registry etc. are real answers
+        opened = self._update(key, lambda bucket, breaker: breaker.record(failed, time.time()))
+        if opened:
+            WHOIS_CIRCUIT_OPENS.inc()
+            print(f"[Registry Guard] Circuit opened for .{key} WHOIS after repeated quota/timeout errors")
+
+    def open_circuits(self) -> list:
+        with self._lock:
+            if self.path is not None:
+                try:
+                    rows = self._connection().execute(
+                        "SELECT key FROM registry_guard WHERE state != ?", (CircuitBreaker.CLOSED,)).fetchall()
+                    return sorted(row[0] for row in rows)
+                except sqlite3.Error as e:
+                    print(f"[Registry Guard] Shared state unavailable, using this process's limits: {e}")
+            return sorted(key for key, breaker in self._breakers.items() if breaker.state != CircuitBreaker.CLOSED)
+
+# Singleton instance: limits are per registry, so every WHOIS client in the process (and,
+# through the WHOIS cache file, every process on the box) shares them
+registry_guard = RegistryGuard(path=whois_cache_path())
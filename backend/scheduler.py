@@ -0,0 +1,107 @@
+# scheduler.py
+import asyncio
+import math
+import time
+
+PRIORITY_INTERACTIVE = 'interactive'  # Browser-extension lookups, someone is waiting
+PRIORITY_BULK = 'bulk'                # Batch endpoint and scripted scans
+
+class AnalysisOverloadedError(RuntimeError):
+    """Raised when a priority class's queue is full; carries a Retry-After hint in seconds."""
+
+    def __init__(self, priority: str, retry_after: int):
+        super().__init__(f"'{priority}' analysis queue is full, retry in {retry_after}s")
+        self.priority = priority
+        self.retry_after = retry_after
+
+class PriorityClass:
+    """Concurrency limit + bounded wait queue for one class of traffic."""
+
+    def __init__(self, name: str, max_concurrency: int, max_queue: int):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self.running = 0
+        self.waiting = 0
+        self.completed = 0
+        self.rejected = 0
+        self.avg_service_seconds = 1.0  # Moving average, used for Retry-After
+
+    def retry_after(self) -> int:
+        """Rough time for the current queue to drain, clamped to [1, 60] seconds."""
+        drain = (self.waiting + self.running) / self.max_concurrency * self.avg_service_seconds
+        return max(1, min(60, math.ceil(drain)))
+
+class AnalysisScheduler:
+    """
+    Runs blocking analysis work on a shared executor with separate priority classes.
+    Each class has its own concurrency slots, so a large bulk scan can never take the
+    slots interactive users need, and its own bounded queue: when it is full new work
+    is rejected straight away instead of piling up latency. Only used from the event loop.
+    """
+
+    def __init__(self, executor, classes: list):
+        self.executor = executor
+        self._classes = {priority_class.name: priority_class for priority_class in classes}
+
+    def has_class(self, priority: str) -> bool:
+        return priority in self._classes
+
+    def check_admission(self, priority: str):
+        """Raises AnalysisOverloadedError if the class cannot take more queued work."""
+        priority_class = self._classes[priority]
+        no_free_slot = priority_class._slots.locked()
+        if no_free_slot and priority_class.waiting >= priority_class.max_queue:
+            priority_class.rejected += 1
+            raise AnalysisOverloadedError(priority, priority_class.retry_after())
+
+    async def run(self, priority: str, fn, *args, admit: bool = True):
+        """
+        Runs fn(*args) on the executor once a slot of the given class is free.
+        admit=False skips the queue-full check, for work that was admitted as a
+        whole (e.g. the URLs of an accepted batch, which bounds itself). If the caller
+        is cancelled, the slot stays taken until fn has actually finished: the thread
+        cannot be stopped, and it must keep counting against the class's limit.
+        """
+        priority_class = self._classes[priority]
+        if admit:
+            self.check_admission(priority)
+
+        priority_class.waiting += 1
+        try:
+            await priority_class._slots.acquire()
+        finally:
+            priority_class.waiting -= 1
+
+        priority_class.running += 1
+        started = time.monotonic()
+
+        def release(_future):
+            elapsed = time.monotonic() - started
+            priority_class.avg_service_seconds = 0.9 * priority_class.avg_service_seconds + 0.1 * elapsed
+            priority_class.running -= 1
+            priority_class.completed += 1
+            priority_class._slots.release()
+
+        try:
+            future = asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+        except BaseException:
+            release(None)
+            raise
+        future.add_done_callback(release)
+        # shield: cancelling the caller must not mark the work done while its thread runs on
+        return await asyncio.shield(future)
+
+    def stats(self) -> dict:
+        return {
+            name: {
+                'running': priority_class.running,
+                'waiting': priority_class.waiting,
+                'max_concurrency': priority_class.max_concurrency,
+                'max_queue': priority_class.max_queue,
+                'completed': priority_class.completed,
+                'rejected': priority_class.rejected,
+            }
+            for name, priority_class in self._classes.items()
+        }
@@ -0,0 +1,86 @@
+# shared_cache.py
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Set by gunicorn_conf.py in multi-worker mode; unset means in-process caches only.
+SHARED_CACHE_ENV = "PHISHEYE_SHARED_CACHE"
+
+class SharedCache:
+    """
+    Small key -> JSON value store with expiry on a local SQLite file (WAL mode), so
+    every worker process on the box sees the same WHOIS results and verdicts.
+    Connections are opened per thread and per process (never shared across fork).
+    Any SQLite error is treated as a cache miss: the cache must never fail a request.
+    """
+    PURGE_EVERY_WRITES = 1000
+
+    def __init__(self, path: str, namespace: str):
+        self.path = path
+        self.namespace = namespace
+        self._local = threading.local()
+        self._writes = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=2, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS cache (
+                    namespace TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    PRIMARY KEY (namespace, key)
+                )""")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key: str):
+        """Returns (value, seconds_left), or None if missing/expired."""
+        try:
+            row = self._connection().execute(
+                "SELECT value, expires_at FROM cache WHERE namespace = ? AND key = ?",
+                (self.namespace, key)).fetchone()
+        except sqlite3.Error as e:
+            print(f"[Shared Cache] Read failed for {self.namespace}/{key}: {e}")
+            return None
+        if row is None:
+            return None
+        seconds_left = row[1] - time.time()
+        if seconds_left <= 0:
+            return None
+        return json.loads(row[0]), seconds_left
+
+    def items(self) -> list:
+        """(key, value) of every live entry in the namespace."""
+        try:
+            rows = self._connection().execute(
+                "SELECT key, value FROM cache WHERE namespace = ? AND expires_at > ?",
+                (self.namespace, time.time())).fetchall()
+        except sqlite3.Error as e:
+            print(f"[Shared Cache] Read failed for {self.namespace}: {e}")
+            return []
+        return [(key, json.loads(value)) for key, value in rows]
+
+    def set(self, key: str, value, ttl_seconds: float):
+        try:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                (self.namespace, key, json.dumps(value), time.time() + ttl_seconds))
+            self._writes += 1
+            if self._writes % self.PURGE_EVERY_WRITES == 0:
+                conn.execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),))
+        except sqlite3.Error as e:
+            print(f"[Shared Cache] Write failed for {self.namespace}/{key}: {e}")
+
+def open_shared_cache(namespace: str):
+    """SharedCache for the namespace if multi-worker mode configured one, else None."""
+    path = os.environ.get(SHARED_CACHE_ENV)
+    return SharedCache(path, namespace) if path else None
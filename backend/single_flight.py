@@ -0,0 +1,71 @@
+# single_flight.py
+import asyncio
+import threading
+
+class _Call:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls for the same key: the first caller runs the function,
+    everyone arriving while it runs waits and receives the same result (or exception).
+    Thread-based, for the blocking pipeline running on worker threads.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn, *args, **kwargs):
+        with self._lock:
+            call = self._calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = self._calls[key] = _Call()
+
+        if not is_leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+class AsyncSingleFlight:
+    """
+    asyncio version of SingleFlight: duplicate requests await one shared task, so
+    they do not take extra executor slots or admission capacity while they wait.
+    """
+
+    def __init__(self):
+        self._calls = {}
+
+    async def do(self, key, coro_fn, *args, **kwargs):
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(coro_fn(*args, **kwargs))
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+        # shield: one client disconnecting must not cancel the work for the others.
+        return await asyncio.shield(task)
+
+    def in_flight(self) -> int:
+        return len(self._calls)
@@ -0,0 +1,7 @@
+# conftest.py
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # backend/ modules import each other flat
+os.environ.setdefault("PHISHEYE_WHOIS_CACHE", "")  # Tests opt in to a persistent cache via tmp_path
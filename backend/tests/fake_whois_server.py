@@ -0,0 +1,77 @@
+# fake_whois_server.py
+# Local stand-in for the WHOIS hierarchy the async client walks: a root server that
+# names the registry of each TLD, a thin registry that only refers to the registrar,
+# and the registrar holding the dates. Each runs on its own 127.0.0.1 port.
+import asyncio
+from contextlib import asynccontextmanager
+
+STALL = object()  # Response that never comes: the server keeps the connection open silently
+
+class FakeWhoisServer:
+    """Answers each query line with responses[query] (default: not found), counting connections."""
+
+    def __init__(self, responses: dict = None, delay: float = 0.0):
+        self.responses = responses or {}
+        self.delay = delay
+        self.queries = []
+        self.active = 0
+        self.max_active = 0
+        self.port = None
+        self._server = None
+        self._stalled = []
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, '127.0.0.1', 0)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    @property
+    def address(self) -> str:
+        return f"127.0.0.1:{self.port}"
+
+    async def _handle(self, reader, writer):
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            query = (await reader.readline()).decode('utf-8').strip()
+            self.queries.append(query)
+            await asyncio.sleep(self.delay)
+            response = self.responses.get(query, "No match for domain \"%s\".\r\n" % query.upper())
+            if response is STALL:
+                self._stalled.append(writer)
+                await asyncio.Event().wait()
+            writer.write(response.encode('utf-8'))
+            await writer.drain()
+        finally:
+            self.active -= 1
+            writer.close()
+
+    async def stop(self):
+        for writer in self._stalled:
+            writer.close()
+        self._server.close()
+        await self._server.wait_closed()
+
+@asynccontextmanager
+async def fake_whois_hierarchy(registrar_domains: dict, registry_responses: dict = None,
+                               registry_delay: float = 0.0):
+    """
+    Yields (root, registry, registrar). The root refers 'com' to the registry; the
+    registry answers registrar_domains (domain -> creation date) with a bare referral
+    to the registrar, which holds the dates. registry_responses override the
+    registry's answer for specific domains (quota messages, STALL, ...).
+    """
+    registrar = await FakeWhoisServer({
+        domain: (f"Domain Name: {domain.upper()}\r\nCreation Date: {created}\r\n"
+                 f"Registrar Registration Expiration Date: 2099-01-01T00:00:00Z\r\n")
+        for domain, created in registrar_domains.items()}).start()
+    registry = await FakeWhoisServer({
+        domain: (f"   Domain Name: {domain.upper()}\r\n   Registrar WHOIS Server: {registrar.address}\r\n")
+        for domain in registrar_domains}, delay=registry_delay).start()
+    registry.responses.update(registry_responses or {})
+    root = await FakeWhoisServer({'com': f"domain:       COM\r\nrefer:        {registry.address}\r\n"}).start()
+    try:
+        yield root, registry, registrar
+    finally:
+        for server in (root, registry, registrar):
+            await server.stop()
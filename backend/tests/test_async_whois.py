@@ -0,0 +1,84 @@
+# test_async_whois.py
+import asyncio
+import threading
+from datetime import datetime, timezone
+
+from async_whois import AsyncWhoisClient
+from fake_whois_server import STALL, fake_whois_hierarchy
+from whois_cache import WhoisCache
+
+CREATED = "2001-02-03T04:05:06Z"
+CREATED_EPOCH = datetime(2001, 2, 3, 4, 5, 6, tzinfo=timezone.utc).timestamp()
+
+def _client(root, **kwargs) -> AsyncWhoisClient:
+    return AsyncWhoisClient(root_server=root.address, guard=None, **kwargs)
+
+def test_found_domain_follows_root_and_registrar_referrals():
+    async def scenario():
+        async with fake_whois_hierarchy({'example.com': CREATED}) as (root, registry, registrar):
+            client = _client(root)
+            record = await client.lookup_record('example.com')
+            features = await client.get_whois_features('www.example.com/login')
+            assert (root.queries, registry.queries, registrar.queries) == (
+                ['com'], ['example.com', 'example.com'], ['example.com', 'example.com'])
+            return record, features
+
+    record, features = asyncio.run(scenario())
+    assert record['error'] is None and record['creation_date'] == CREATED_EPOCH
+    assert features['whois_lookup_failed'] == 0 and features['domain_age'] > 365 * 20
+
+def test_unregistered_domain_is_not_found():
+    async def scenario():
+        async with fake_whois_hierarchy({}) as (root, registry, registrar):
+            return await _client(root).lookup_record('unregistered.com'), registrar.queries
+
+    record, registrar_queries = asyncio.run(scenario())
+    assert record['error'] == 'whois_domain_not_found' and registrar_queries == []
+
+def test_registry_quota_message_is_a_quota_error():
+    async def scenario():
+        async with fake_whois_hierarchy({}, {'busy.com': "%% Query rate limit exceeded\r\n"}) as (root, _, _):
+            return await _client(root).lookup_record('busy.com')
+
+    assert asyncio.run(scenario())['error'] == 'whois_quota_exceeded'
+
+def test_silent_registry_is_a_timeout():
+    async def scenario():
+        async with fake_whois_hierarchy({}, {'stalled.com': STALL}) as (root, _, _):
+            return await _client(root, timeout=0.2).lookup_record('stalled.com')
+
+    assert asyncio.run(scenario())['error'] == 'whois_timeout'
+
+def test_connections_per_server_are_capped():
+    domains = {f'site{i}.com': CREATED for i in range(8)}
+
+    async def scenario():
+        async with fake_whois_hierarchy(domains, registry_delay=0.05) as (root, registry, registrar):
+            client = _client(root, per_server_limit=2)
+            records = await asyncio.gather(*(client.lookup_record(domain) for domain in domains))
+            return records, registry.max_active, registrar.max_active
+
+    records, registry_peak, registrar_peak = asyncio.run(scenario())
+    assert all(record['creation_date'] == CREATED_EPOCH for record in records)
+    assert registry_peak == 2 and registrar_peak <= 2
+
+def test_persistent_cache_is_used_off_the_event_loop(tmp_path):
+    cache_threads = []
+
+    class RecordingCache(WhoisCache):
+        def get(self, *args):
+            cache_threads.append(threading.current_thread())
+            return super().get(*args)
+
+        def put(self, *args):
+            cache_threads.append(threading.current_thread())
+            return super().put(*args)
+
+    async def scenario():
+        async with fake_whois_hierarchy({'example.com': CREATED}) as (root, _, _):
+            client = _client(root)
+            client._persistent_cache = RecordingCache(tmp_path / "whois.sqlite3")
+            return await client.get_whois_features('example.com')
+
+    assert asyncio.run(scenario())['whois_lookup_failed'] == 0
+    assert len(cache_threads) == 2 and threading.main_thread() not in cache_threads
@@ -0,0 +1,21 @@
+# test_feature_extractor.py
+import math
+
+from feature_extractor_1 import FeatureExtractor
+
+class _RecordingWhois:
+    def __init__(self):
+        self.waits = []
+
+    def get_whois_features(self, domain, rate_limit_wait=0.0):
+        self.waits.append(rate_limit_wait)
+        return {'whois_lookup_failed': 0, 'domain_age': 100, 'domain_lifespan': 365}
+
+def test_batch_fallback_rows_wait_for_whois_tokens_like_the_rest():
+    extractor = FeatureExtractor(enable_whois=False)
+    extractor.whois_handler = _RecordingWhois()
+    extractor.enable_whois = True
+    # The non-ASCII and tab URLs go through the scalar fallback
+    extractor.extract_features_batch(["http://example.com/a", "https://пример.рф/путь", "http://exa\tmple.org/"])
+    assert len(extractor.whois_handler.waits) == 3
+    assert all(wait == math.inf for wait in extractor.whois_handler.waits)
@@ -0,0 +1,57 @@
+# test_multi_worker.py
+# Two stores/registries on one SQLite file stand in for two gunicorn workers.
+import asyncio
+import threading
+
+import analysis_store
+from analysis_store import AnalysisStore
+from metrics import MetricsRegistry, Counter
+from shared_cache import SharedCache
+from verdict_cache import VerdictCache
+
+def test_progressive_analysis_is_visible_from_another_worker(tmp_path, monkeypatch):
+    monkeypatch.setattr(analysis_store, 'SHARED_POLL_SECONDS', 0.01)
+    path = str(tmp_path / "shared.sqlite3")
+    owner = AnalysisStore(shared=SharedCache(path, 'analyses'))
+    other = AnalysisStore(shared=SharedCache(path, 'analyses'))
+
+    async def scenario():
+        record = owner.create("http://example.com/")
+        record.set_lexical({'category': 'SAFE'})
+        await record.published()
+        view = await other.get(record.analysis_id)
+        assert view.status == 'pending' and view.lexical == {'category': 'SAFE'}
+
+        waiter = asyncio.create_task(view.wait())
+        await asyncio.sleep(0.05)
+        assert not waiter.done()
+        record.finish({'category': 'MALICIOUS'})
+        await asyncio.wait_for(waiter, 1)
+        assert view.to_dict() == record.to_dict()
+        assert await other.get("unknown") is None
+
+    asyncio.run(scenario())
+
+def test_metrics_of_every_worker_are_rendered_with_a_worker_label():
+    workers = {}
+    for pid, amount in (('101', 3), ('102', 4)):
+        registry = MetricsRegistry()
+        registry.register(Counter('phisheye_test_total', 'Test counter.', ('result',))).inc('hit', amount=amount)
+        workers[pid] = registry.collect()
+
+    lines = MetricsRegistry().render(workers).splitlines()
+    assert lines.count('# TYPE phisheye_test_total counter') == 1
+    assert 'phisheye_test_total{result="hit",worker="101"} 3.0' in lines
+    assert 'phisheye_test_total{result="hit",worker="102"} 4.0' in lines
+
+def test_shared_verdicts_are_read_off_the_event_loop(tmp_path):
+    shared = SharedCache(str(tmp_path / "shared.sqlite3"), 'verdicts')
+    shared.set("http://example.com/", {'category': 'SAFE'}, 60)
+    reader_threads = []
+    shared_get = shared.get
+    shared.get = lambda key: reader_threads.append(threading.current_thread()) or shared_get(key)
+
+    cache = VerdictCache(shared=shared)
+    report = asyncio.run(cache.get_async("http://example.com/"))
+    assert report == {'category': 'SAFE'} and cache.hits == 1
+    assert reader_threads and reader_threads[0] is not threading.main_thread()
@@ -0,0 +1,107 @@
+# test_orchestrator.py
+import asyncio
+import threading
+
+import pytest
+
+import orchestrator
+from scheduler import AnalysisOverloadedError, PRIORITY_BULK, PRIORITY_INTERACTIVE
+from url_utils import normalize_url
+from verdict_cache import verdict_cache
+
+def test_cached_verdicts_are_answered_without_a_pool_slot(monkeypatch):
+    async def overloaded(priority, fn, *args, admit=True):
+        raise AnalysisOverloadedError(priority, 1)
+    monkeypatch.setattr(orchestrator.scheduler, 'run', overloaded)
+    url = "http://cached.example.com/login"
+    verdict_cache.put(normalize_url(url), {'url': url, 'category': 'MALICIOUS'})
+    try:
+        report = asyncio.run(orchestrator.orchestrate_url_analysis_async(url))
+    finally:
+        verdict_cache.clear()
+    assert report['category'] == 'MALICIOUS'
+
+def test_each_priority_class_runs_its_stages_on_its_own_pool(monkeypatch):
+    stage_threads = []
+
+    def fake_predict(url, *args):
+        stage_threads.append(threading.current_thread().name)
+        return {'success': True, 'verdict': 'SAFE', 'threat_score': 1, 'confidence': 0.1, 'features': {}}
+    monkeypatch.setattr(orchestrator, 'predict_url', fake_predict)
+    monkeypatch.setattr(orchestrator, 'analyze_page_content', lambda url: {})
+    monkeypatch.setattr(orchestrator.verdict_cache, 'put', lambda key, report: None)
+
+    orchestrator.orchestrate_url_analysis("http://a.example.com/", priority=PRIORITY_INTERACTIVE)
+    orchestrator.orchestrate_url_analysis("http://b.example.com/", priority=PRIORITY_BULK)
+    assert stage_threads[0].startswith("interactive-stage") and stage_threads[1].startswith("bulk-stage")
+
+def test_batch_warms_each_host_with_one_url_then_runs_the_rest_concurrently(monkeypatch):
+    running, peaks = [0], []
+
+    async def fake_run(priority, fn, url, *args, admit=True):
+        running[0] += 1
+        peaks.append(running[0])
+        await asyncio.sleep(0.01)
+        running[0] -= 1
+        return {'url': url, 'category': 'SAFE'}
+    monkeypatch.setattr(orchestrator.scheduler, 'run', fake_run)
+
+    async def collect(urls):
+        return [report async for report in orchestrator.orchestrate_batch_analysis(urls)]
+
+    urls = [f"http://one-host.example.com/{i}" for i in range(10)]
+    reports = asyncio.run(collect(urls))
+    assert len(reports) == 10
+    assert peaks[:2] == [1, 1]  # The first URL ran alone
+    assert max(peaks) == orchestrator.BATCH_PER_HOST_CONCURRENCY
+
+def test_an_uncached_analysis_counts_one_verdict_cache_miss(monkeypatch):
+    monkeypatch.setattr(orchestrator, 'predict_url', lambda url, *args: {
+        'success': True, 'verdict': 'MALICIOUS', 'threat_score': 90, 'confidence': 0.9, 'features': {}})
+    monkeypatch.setattr(orchestrator, 'analyze_page_content', lambda url: {})
+    verdict_cache.clear()
+    monkeypatch.setattr(verdict_cache, 'hits', 0)
+    monkeypatch.setattr(verdict_cache, 'misses', 0)
+
+    async def analyse_twice():
+        for _ in range(2):
+            await orchestrator.orchestrate_url_analysis_async("http://count.example.com/")
+    try:
+        asyncio.run(analyse_twice())
+    finally:
+        verdict_cache.clear()
+    assert (verdict_cache.misses, verdict_cache.hits) == (1, 1)
+
+def test_interactive_request_does_not_join_a_bulk_run_of_the_same_url(monkeypatch):
+    bulk_started, release_bulk = threading.Event(), threading.Event()
+    priorities = []
+
+    def fake_analyze(url, cache_key, whois_rate_limit_wait, priority):
+        priorities.append(priority)
+        if priority == PRIORITY_BULK:
+            bulk_started.set()
+            release_bulk.wait(5)
+        return {'url': url, 'category': 'SAFE', 'priority': priority}
+    monkeypatch.setattr(orchestrator, '_analyze_url', fake_analyze)
+
+    url = "http://shared.example.com/"
+    bulk = threading.Thread(target=orchestrator._analyze_uncached, args=(url, url, 3.0, PRIORITY_BULK))
+    bulk.start()
+    try:
+        assert bulk_started.wait(2)
+        report = orchestrator._analyze_uncached(url, url, 0.0, PRIORITY_INTERACTIVE)
+    finally:
+        release_bulk.set()
+        bulk.join()
+    assert report['priority'] == PRIORITY_INTERACTIVE and sorted(priorities) == sorted([PRIORITY_BULK, PRIORITY_INTERACTIVE])
+
+def test_rejected_progressive_analysis_leaves_no_pending_record(monkeypatch):
+    async def overloaded(priority, fn, *args, admit=True):
+        raise AnalysisOverloadedError(priority, 1)
+    monkeypatch.setattr(orchestrator.scheduler, 'run', overloaded)
+    created = []
+    monkeypatch.setattr(orchestrator.analysis_store, 'create', lambda url: created.append(url))
+
+    with pytest.raises(AnalysisOverloadedError):
+        asyncio.run(orchestrator.start_progressive_analysis("http://rejected.example.com/"))
+    assert created == []
@@ -0,0 +1,44 @@
+# test_registry_guard.py
+from registry_guard import RegistryGuard
+from whois_cache import WHOIS_SKIPPED
+from whois_handler import RobustWhoisHandler
+
+class _WhoisEntry(dict):
+    creation_date = None
+    expiration_date = None
+
+def _handler(guard):
+    handler = RobustWhoisHandler(max_retries=1, guard=guard)
+    handler.whois_lookup_with_timeout = lambda domain: _WhoisEntry()
+    return handler
+
+def test_interactive_lookups_over_the_rate_limit_are_skipped():
+    handler = _handler(RegistryGuard(rate_per_second=0.01, burst=2))
+    results = [handler.get_whois_features(f'd{i}.com') for i in range(4)]
+    assert [r['whois_lookup_failed'] for r in results] == [0, 0, 1, 1]
+    assert results[3]['whois_quota_exceeded'] == 1 and results[3][WHOIS_SKIPPED] == 1
+    assert WHOIS_SKIPPED not in results[0]
+
+def test_waiting_callers_queue_for_a_token_instead_of_degrading():
+    handler = _handler(RegistryGuard(rate_per_second=50, burst=2))
+    results = [handler.get_whois_features(f'd{i}.com', rate_limit_wait=5) for i in range(10)]
+    assert all(r['whois_lookup_failed'] == 0 and WHOIS_SKIPPED not in r for r in results)
+
+def test_open_circuit_is_refused_even_for_waiting_callers():
+    guard = RegistryGuard(failure_threshold=2, reset_timeout=60)
+    for _ in range(2):
+        assert guard.admit('com') is None
+        guard.record('com', 'whois_quota_exceeded')
+    assert guard.admit('com', max_wait=5) == 'circuit_open'
+    assert guard.admit('org') is None
+
+def test_guards_sharing_a_file_share_one_limit_and_breaker(tmp_path):
+    path = tmp_path / "whois_cache.sqlite3"
+    worker_a = RegistryGuard(rate_per_second=0.01, burst=2, failure_threshold=2, path=path)
+    worker_b = RegistryGuard(rate_per_second=0.01, burst=2, failure_threshold=2, path=path)
+    assert worker_a.admit('com') is None and worker_b.admit('com') is None
+    assert worker_a.admit('com') == 'rate_limited' and worker_b.admit('com') == 'rate_limited'
+
+    worker_a.record('net', 'whois_timeout')
+    worker_b.record('net', 'whois_timeout')
+    assert worker_a.admit('net') == 'circuit_open' and worker_b.open_circuits() == ['net']
@@ -0,0 +1,26 @@
+# test_scheduler.py
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from scheduler import AnalysisScheduler, PriorityClass, PRIORITY_BULK
+
+def test_cancelled_caller_keeps_its_slot_until_the_work_finishes():
+    release_work = threading.Event()
+    executor = ThreadPoolExecutor(max_workers=4)
+    scheduler = AnalysisScheduler(executor, [PriorityClass(PRIORITY_BULK, 1, 10)])
+
+    async def scenario():
+        first = asyncio.create_task(scheduler.run(PRIORITY_BULK, release_work.wait, 5))
+        await asyncio.sleep(0.05)
+        first.cancel()  # e.g. the batch client disconnected
+        second = asyncio.create_task(scheduler.run(PRIORITY_BULK, lambda: 'done'))
+        await asyncio.sleep(0.05)
+        stats_while_blocked = scheduler.stats()[PRIORITY_BULK]
+        release_work.set()
+        return stats_while_blocked, await asyncio.wait_for(second, 2)
+
+    stats, result = asyncio.run(scenario())
+    executor.shutdown()
+    assert stats['running'] == 1 and stats['waiting'] == 1
+    assert result == 'done' and scheduler.stats()[PRIORITY_BULK]['running'] == 0
@@ -0,0 +1,55 @@
+# test_whois_handler.py
+import importlib
+import socket
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("whois")
+nic_client = importlib.import_module("whois.whois").NICClient  # whois.whois is also the lookup function
+
+from whois_cache import WhoisCache
+from whois_handler import RobustWhoisHandler
+
+@pytest.fixture
+def stalled_registry(monkeypatch):
+    """Port-43 stand-in that accepts connections and never answers; python-whois is pointed at it."""
+    server = socket.socket()
+    server.bind(('127.0.0.1', 0))
+    server.listen()
+    accepted = []
+
+    def accept_forever():
+        while True:
+            try:
+                accepted.append(server.accept()[0])
+            except OSError:
+                return
+
+    threading.Thread(target=accept_forever, daemon=True).start()
+    port = server.getsockname()[1]
+
+    class RedirectedSocket(socket.socket):
+        def connect(self, address):
+            super().connect(('127.0.0.1', port))
+
+    monkeypatch.setattr(nic_client, 'get_socket', lambda self: RedirectedSocket())
+    monkeypatch.setattr(nic_client, 'choose_server', lambda self, domain: 'whois.stalled-registry.test')
+    yield
+    server.close()
+    for conn in accepted:
+        conn.close()
+
+def test_stalled_registry_is_a_timeout_and_not_cached_as_success(stalled_registry, tmp_path, monkeypatch):
+    cache_path = tmp_path / "whois.sqlite3"
+    monkeypatch.setenv("PHISHEYE_WHOIS_CACHE", str(cache_path))
+    handler = RobustWhoisHandler(timeout=0.3, max_retries=1, guard=None)
+
+    features = handler.get_whois_features('stalled-registry.com')
+
+    assert features['whois_lookup_failed'] == 1
+    assert features['whois_timeout'] == 1
+    record, expires_at = WhoisCache(cache_path).get('stalled-registry.com')
+    assert record['error'] == 'whois_timeout'
+    assert expires_at < time.time() + 2 * handler.ttls['whois_timeout']  # Not the 7-day success TTL
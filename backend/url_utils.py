@@ -0,0 +1,40 @@
+# url_utils.py
+import re
+from urllib.parse import urlsplit, urlunsplit
+
+def normalize_url(url: str) -> str:
+    """
+    Canonical form of a URL used for de-duplication and cache keys.
+    Adds the http:// scheme the feature extractor would add anyway and lowercases
+    scheme + host; path, query and fragment are kept since features depend on them.
+    """
+    url = url.strip()
+    if not re.match(r'^https?://', url, re.IGNORECASE):
+        url = "http://" + url
+    try:
+        parts = urlsplit(url)
+    except ValueError:
+        return url
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path, parts.query, parts.fragment))
+
+def url_host(url: str) -> str:
+    """Hostname of an already-normalized URL ('' if it cannot be parsed)."""
+    try:
+        return urlsplit(url).hostname or ''
+    except ValueError:
+        return ''
+
+def group_urls_by_host(urls) -> dict:
+    """
+    Normalizes and de-duplicates URLs, grouping them by host so per-host work
+    (WHOIS, politeness towards the site) can be shared. Keeps first-seen order.
+    """
+    groups = {}
+    seen = set()
+    for url in urls:
+        normalized = normalize_url(url)
+        if normalized in seen:
+            continue
+        seen.add(normalized)
+        groups.setdefault(url_host(normalized), []).append(normalized)
+    return groups
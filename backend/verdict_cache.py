@@ -0,0 +1,110 @@
+# verdict_cache.py
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+
+from shared_cache import open_shared_cache
+
+# Seconds a verdict stays valid, per category. Benign verdicts expire quickly so a
+# site that turns malicious is re-checked soon; malicious ones rarely become safe.
+DEFAULT_TTLS = {
+    'SAFE': 300,
+    'SUSPICIOUS': 300,
+    'MALICIOUS': 3600,
+}
+
+class VerdictCache:
+    """
+    Bounded, thread-safe LRU cache of final analysis reports keyed by normalized URL,
+    with a TTL per verdict category and hit/miss counters. With a SharedCache behind it,
+    verdicts computed by one worker process are reused by all the others.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttls: dict = None, shared=None):
+        self.max_entries = max_entries
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.shared = shared
+        self._entries = OrderedDict()  # key -> (expires_at, report)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str):
+        """Returns a copy of the cached report, or None if missing or expired."""
+        report = self._get_local(key)
+        if report is not None or not self.shared:
+            return self._counted(report)
+        return self._counted(self._adopt_shared(key, self.shared.get(key)))
+
+    async def get_async(self, key: str):
+        """get() for the event loop: the shared tier (SQLite, may wait on a lock) is read on a thread."""
+        report = self._get_local(key)
+        if report is not None or not self.shared:
+            return self._counted(report)
+        return self._counted(self._adopt_shared(key, await asyncio.to_thread(self.shared.get, key)))
+
+    def _get_local(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                return dict(entry[1])
+            if entry is not None:
+                del self._entries[key]
+            return None
+
+    def _adopt_shared(self, key: str, shared_entry):
+        """Keeps a report found in the shared tier locally for the rest of its lifetime."""
+        if shared_entry is None:
+            return None
+        report, seconds_left = shared_entry
+        with self._lock:
+            self._store_locally(key, report, seconds_left)
+        return dict(report)
+
+    def _counted(self, report):
+        with self._lock:
+            if report is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return report
+
+    def put(self, key: str, report: dict):
+        """Stores a report; categories without a TTL (e.g. ERROR) are never cached."""
+        ttl = self.ttls.get(report.get('category'))
+        if not ttl:
+            return
+        with self._lock:
+            self._store_locally(key, report, ttl)
+        if self.shared:
+            self.shared.set(key, report, ttl)
+
+    def _store_locally(self, key: str, report: dict, ttl: float):
+        """Caller must hold self._lock."""
+        self._entries[key] = (time.monotonic() + ttl, dict(report))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+# Singleton instance shared by the orchestrator (and, in multi-worker mode, by all workers)
+verdict_cache = VerdictCache(shared=open_shared_cache('verdicts'))
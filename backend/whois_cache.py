@@ -0,0 +1,167 @@
+# whois_cache.py
+import os
+import random
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from metrics import WHOIS_CACHE_ENTRIES, WHOIS_CACHE_EVICTIONS
+
+# Overrides the cache file location; an empty value disables the persistent cache.
+WHOIS_CACHE_ENV = "PHISHEYE_WHOIS_CACHE"
+DEFAULT_WHOIS_CACHE_PATH = Path(__file__).parent / "data" / "whois_cache.sqlite3"
+
+# Seconds a WHOIS record stays valid, by outcome (None = the lookup succeeded).
+# Registration data rarely changes; transient registry failures are retried soon.
+DEFAULT_TTLS = {
+    None: 7 * 24 * 3600,
+    'whois_domain_not_found': 6 * 3600,  # May get registered (phishing domains often are)
+    'whois_private_registry': 24 * 3600,
+    'whois_other_error': 900,
+    'whois_quota_exceeded': 300,
+    'whois_timeout': 120,
+}
+# Outcomes decided on our side, not by the registry (pool full, registry guard said
+# no): never cached, and shown to the model as the flag of the registry failure they stand for
+LOCAL_ERROR_FLAGS = {
+    'whois_overloaded': 'whois_timeout',
+    'whois_throttled': 'whois_quota_exceeded',
+}
+WHOIS_SKIPPED = 'whois_skipped'  # Marker in WHOIS features (not a model input) for such outcomes
+TTL_JITTER = 0.1  # +-10%, so entries written together (a cold start, a training run) do not expire together
+
+class WhoisCache:
+    """
+    Persistent registrable domain -> WHOIS record store on a local SQLite file (WAL
+    mode), shared by every API worker and training run on the box and kept across
+    restarts. A record holds what the registry said, not derived features:
+    {'creation_date': epoch seconds or None, 'expiration_date': ..., 'error': flag or None},
+    so domain_age is computed at read time and stays correct while the entry lives.
+    Connections are per thread and per process; SQLite errors count as misses.
+    """
+    PURGE_EVERY_WRITES = 1000
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._local = threading.local()
+        self._writes = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=2, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS whois (
+                    domain TEXT PRIMARY KEY,
+                    creation_date REAL,
+                    expiration_date REAL,
+                    error TEXT,
+                    fetched_at REAL NOT NULL,
+                    expires_at REAL NOT NULL
+                )""")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, domain: str, allow_expired: bool = False):
+        """Returns (record, expires_at), or None if missing/expired (unless allow_expired)."""
+        try:
+            row = self._connection().execute(
+                "SELECT creation_date, expiration_date, error, expires_at FROM whois WHERE domain = ?",
+                (domain,)).fetchone()
+        except sqlite3.Error as e:
+            print(f"[WHOIS Cache] Read failed for {domain}: {e}")
+            return None
+        if row is None or (row[3] <= time.time() and not allow_expired):
+            return None
+        return {'creation_date': row[0], 'expiration_date': row[1], 'error': row[2]}, row[3]
+
+    def put(self, domain: str, record: dict, ttl_seconds: float) -> float:
+        """Stores record for about ttl_seconds (jittered); returns its expiry time."""
+        now = time.time()
+        expires_at = now + ttl_seconds * random.uniform(1 - TTL_JITTER, 1 + TTL_JITTER)
+        try:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO whois (domain, creation_date, expiration_date, error, fetched_at, expires_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (domain, record['creation_date'], record['expiration_date'], record['error'], now, expires_at))
+            self._writes += 1
+            if self._writes % self.PURGE_EVERY_WRITES == 0:
+                conn.execute("DELETE FROM whois WHERE expires_at <= ?", (now,))
+        except sqlite3.Error as e:
+            print(f"[WHOIS Cache] Write failed for {domain}: {e}")
+        return expires_at
+
+class WhoisMemoryCache:
+    """
+    Bounded, thread-safe LRU of WHOIS records in front of the persistent cache, keyed
+    by registrable domain. Entries carry their absolute expiry (epoch seconds) so a
+    record read from the persistent cache keeps the lifetime it was given there.
+    """
+
+    def __init__(self, max_entries: int = 20000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # domain -> (record, expires_at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, domain: str):
+        """Returns the record, or None if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(domain)
+            if entry is not None and entry[1] > time.time():
+                self._entries.move_to_end(domain)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                del self._entries[domain]
+                WHOIS_CACHE_EVICTIONS.inc('expired')
+                WHOIS_CACHE_ENTRIES.dec()
+            self.misses += 1
+            return None
+
+    def put(self, domain: str, record: dict, expires_at: float):
+        with self._lock:
+            if domain not in self._entries:
+                WHOIS_CACHE_ENTRIES.inc()
+            self._entries[domain] = (record, expires_at)
+            self._entries.move_to_end(domain)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+                WHOIS_CACHE_EVICTIONS.inc('capacity')
+                WHOIS_CACHE_ENTRIES.dec()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+    def clear(self):
+        with self._lock:
+            WHOIS_CACHE_ENTRIES.dec(amount=len(self._entries))
+            self._entries.clear()
+
+def whois_cache_path():
+    """Path of the box-wide WHOIS SQLite file, or None if PHISHEYE_WHOIS_CACHE is set to an empty value."""
+    return os.environ.get(WHOIS_CACHE_ENV, str(DEFAULT_WHOIS_CACHE_PATH)) or None
+
+def open_whois_cache():
+    """The box-wide WhoisCache, or None if PHISHEYE_WHOIS_CACHE is set to an empty value."""
+    path = whois_cache_path()
+    return WhoisCache(path) if path else None
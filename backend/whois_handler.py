@@ -1,53 +1,78 @@
 # whois_handler.py
-import whois
 from datetime import datetime, timezone
 import socket
 import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
 from functools import lru_cache
 
+from single_flight import SingleFlight
+from metrics import STAGE_LATENCY, WHOIS_ERRORS, WHOIS_CACHE_LOOKUPS
+from whois_cache import DEFAULT_TTLS, LOCAL_ERROR_FLAGS, WHOIS_SKIPPED, WhoisMemoryCache, open_whois_cache
+from registry_guard import registry_guard
+from domain_parser import registrable_domain
+
+class _NeverRaised(Exception):
+    """Stands in for exception classes the installed python-whois does not define."""
+
+def _whois_exception(whois, *names):
+    for name in names:
+        exception_class = getattr(whois.exceptions, name, None)
+        if exception_class is not None:
+            return exception_class
+    return _NeverRaised
+
 class RobustWhoisHandler:
     """
     Robust WHOIS handler with timeout, caching, and comprehensive error handling
     """
+    ERROR_FLAGS = ('whois_timeout', 'whois_domain_not_found', 'whois_private_registry',
+                   'whois_quota_exceeded', 'whois_other_error')
+    WAIT_TIMEOUT_FACTOR = 3
     
-    def __init__(self, timeout=10, max_retries=2):
+    def __init__(self, timeout=10, max_retries=2, max_cached_domains=20000, ttls=None,
+                 pool_size=8, max_queued=32, guard=registry_guard):
         self.timeout = timeout
         self.max_retries = max_retries
-        self._cache = {}
+        # Fixed threads and a capped queue: a registry outage cannot pile up threads or sockets
+        self._pool = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix='whois')
+        self._pool_slots = threading.BoundedSemaphore(pool_size + max_queued)
+        # Seconds a record is reused, per outcome (None = success, else the whois_* error flag)
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self._cache = WhoisMemoryCache(max_cached_domains)
+        self._persistent_cache = open_whois_cache()  # Shared by all processes, survives restarts
+        self._flights = SingleFlight()  # One registry query per domain, however many callers
+        self._guard = guard  # Per-registry rate limit and circuit breaker
         
     def whois_lookup_with_timeout(self, domain: str) -> dict:
         """
-        Perform WHOIS lookup with timeout and retries
+        Perform WHOIS lookup with timeout and retries. Lookups run on the handler's
+        fixed pool; {'error': 'overloaded'} comes back at once when its queue is full.
         """
+        import whois  # Imported on first lookup to keep it off the API startup path
+        
+        # Exception names differ between python-whois releases
+        command_failed = _whois_exception(whois, 'WhoisCommandFailedError', 'WhoisCommandFailed')
+        private_registry = _whois_exception(whois, 'WhoisPrivateRegistryError')
+        quota_exceeded = _whois_exception(whois, 'WhoisQuotaExceededError', 'WhoisQuotaExceeded')
+        
         for attempt in range(self.max_retries):
             try:
-                # Use threading to implement timeout
-                result = {}
-                exception = None
-                
-                def do_whois():
-                    nonlocal result, exception
-                    try:
-                        result = whois.whois(domain)
-                    except Exception as e:
-                        exception = e
-                
-                thread = threading.Thread(target=do_whois)
-                thread.daemon = True
-                thread.start()
-                thread.join(timeout=self.timeout)
-                
-                if thread.is_alive():
-                    # Thread is still running - timeout occurred
+                if not self._pool_slots.acquire(blocking=False):
+                    return {'error': 'overloaded'}
+                # The socket timeout bounds how long a worker stays busy; the wait below
+                # also covers referrals (each socket operation gets the full timeout).
+                # ignore_socket_errors=False: otherwise python-whois turns a socket timeout
+                # into a "Socket not responding" answer that parses as a dateless success
+                future = self._pool.submit(whois.whois, domain, timeout=self.timeout, ignore_socket_errors=False)
+                future.add_done_callback(lambda _: self._pool_slots.release())
+                try:
+                    return future.result(timeout=self.timeout * self.WAIT_TIMEOUT_FACTOR)
+                except FuturesTimeoutError:
+                    future.cancel()  # Frees the slot now if the lookup never left the queue
                     raise TimeoutError(f"WHOIS lookup timed out after {self.timeout} seconds")
                 
-                if exception:
-                    raise exception
-                    
-                return result
-                
-            except TimeoutError:
+            except (TimeoutError, socket.timeout):
                 if attempt == self.max_retries - 1:
                     return {'error': 'timeout'}
                 time.sleep(1)  # Wait before retry
@@ -58,23 +83,21 @@ class RobustWhoisHandler:
                     return {'error': 'domain_not_found'}
                 time.sleep(1)
                 
-            except whois.exceptions.WhoisCommandFailed as e:
+            except command_failed as e:
                 # WHOIS command failed
                 if attempt == self.max_retries - 1:
                     return {'error': f'whois_command_failed: {str(e)}'}
                 time.sleep(1)
                 
-            except whois.exceptions.WhoisPrivateRegistryError as e:
+            except private_registry as e:
                 # Private registry (like .com)
                 if attempt == self.max_retries - 1:
                     return {'error': 'private_registry'}
                 time.sleep(1)
                 
-            except whois.exceptions.WhoisQuotaExceeded as e:
-                # Rate limiting
-                if attempt == self.max_retries - 1:
-                    return {'error': 'quota_exceeded'}
-                time.sleep(2)  # Longer wait for quota
+            except quota_exceeded as e:
+                # Rate limiting: retrying only hammers the registry; the registry guard backs off
+                return {'error': 'quota_exceeded'}
                 
             except socket.gaierror as e:
                 # DNS resolution error
@@ -82,6 +105,12 @@ class RobustWhoisHandler:
                     return {'error': f'dns_error: {str(e)}'}
                 time.sleep(1)
                 
+            except OSError as e:
+                # Connection refused/reset by the WHOIS server
+                if attempt == self.max_retries - 1:
+                    return {'error': f'other: {str(e)}'}
+                time.sleep(1)
+                
             except Exception as e:
                 # Catch-all for any other exceptions
                 if attempt == self.max_retries - 1:
@@ -90,107 +119,137 @@ class RobustWhoisHandler:
         
         return {'error': 'max_retries_exceeded'}
     
-    def get_whois_features(self, domain: str) -> dict:
+    def get_whois_features(self, domain: str, rate_limit_wait: float = 0.0) -> dict:
         """
-        Extract WHOIS features with comprehensive error handling
+        Extract WHOIS features with comprehensive error handling. rate_limit_wait:
+        seconds to queue for the registry's rate limit before giving up with degraded
+        features (0 for interactive callers, more for training and bulk scans).
         """
-        # Clean domain (remove www. etc.)
-        clean_domain = domain.lower().replace('www.', '').split('/')[0]
-        
-        # Check cache first
-        if clean_domain in self._cache:
-            return self._cache[clean_domain]
-        
-        features = {
-            'whois_lookup_failed': 1,
-            'domain_age': -1,
-            'domain_lifespan': -1,
-            'whois_timeout': 0,
-            'whois_domain_not_found': 0,
-            'whois_private_registry': 0,
-            'whois_quota_exceeded': 0,
-            'whois_other_error': 0
-        }
+        # WHOIS records belong to the registrable domain: a.login.example.co.uk and
+        # b.login.example.co.uk share one lookup (and one cache entry) for example.co.uk
+        clean_domain = registrable_domain(domain.split('/')[0])
         
         # Skip WHOIS for IP addresses
         if self._is_ip_address(clean_domain):
-            features['whois_lookup_failed'] = 1
-            features['whois_other_error'] = 1
-            self._cache[clean_domain] = features
-            return features
+            return self.features_from_record({'creation_date': None, 'expiration_date': None,
+                                               'error': 'whois_other_error'})
+        
+        record = self._cached_record(clean_domain)
+        if record is not None:
+            WHOIS_CACHE_LOOKUPS.inc('hit')
+        else:
+            WHOIS_CACHE_LOOKUPS.inc('miss')
+            record = self._flights.do(clean_domain, self._lookup_and_store, clean_domain, rate_limit_wait)
+        return self.features_from_record(record)
+    
+    def _cached_record(self, clean_domain: str):
+        """Record from the in-process cache, else from the persistent one (other workers, earlier runs)."""
+        record = self._cache.get(clean_domain)
+        if record is None and self._persistent_cache:
+            entry = self._persistent_cache.get(clean_domain)
+            if entry is not None:
+                record = entry[0]
+                self._cache.put(clean_domain, *entry)
+        return record
+    
+    def _lookup_and_store(self, clean_domain: str, rate_limit_wait: float = 0.0) -> dict:
+        tld = clean_domain.rsplit('.', 1)[-1]
+        if self._guard is not None and self._guard.admit(tld, rate_limit_wait):
+            # The registry is rate limiting us or failing: answer now, from a stale record if any
+            stale_entry = self._persistent_cache.get(clean_domain, allow_expired=True) if self._persistent_cache else None
+            return stale_entry[0] if stale_entry else {'creation_date': None, 'expiration_date': None,
+                                                       'error': 'whois_throttled'}
+        record = self._lookup_whois_record(clean_domain)
+        if self._guard is not None:
+            self._guard.record(tld, record['error'])
+        if record['error'] in LOCAL_ERROR_FLAGS:
+            return record
+        ttl = self.ttls.get(record['error'], self.ttls[None])
+        if self._persistent_cache:
+            expires_at = self._persistent_cache.put(clean_domain, record, ttl)
+        else:
+            expires_at = time.time() + ttl
+        self._cache.put(clean_domain, record, expires_at)
+        return record
+    
+    def _lookup_whois_record(self, clean_domain: str) -> dict:
+        """
+        Runs the actual WHOIS query for a domain that is not cached yet. Returns what
+        the registry said (dates as epoch seconds, or the error flag), not features.
+        """
+        record = {'creation_date': None, 'expiration_date': None, 'error': None}
         
         # Perform WHOIS lookup
-        whois_data = self.whois_lookup_with_timeout(clean_domain)
+        with STAGE_LATENCY.time('whois'):
+            whois_data = self.whois_lookup_with_timeout(clean_domain)
         
         if 'error' in whois_data:
             # Handle different error types
             error_type = whois_data['error']
-            features['whois_lookup_failed'] = 1
-            
-            if 'timeout' in error_type:
-                features['whois_timeout'] = 1
+            if error_type == 'overloaded':
+                record['error'] = 'whois_overloaded'
+            elif 'timeout' in error_type:
+                record['error'] = 'whois_timeout'
             elif 'domain_not_found' in error_type:
-                features['whois_domain_not_found'] = 1
+                record['error'] = 'whois_domain_not_found'
             elif 'private_registry' in error_type:
-                features['whois_private_registry'] = 1
+                record['error'] = 'whois_private_registry'
             elif 'quota_exceeded' in error_type:
-                features['whois_quota_exceeded'] = 1
+                record['error'] = 'whois_quota_exceeded'
             else:
-                features['whois_other_error'] = 1
-                
-            self._cache[clean_domain] = features
-            return features
-        
-        # WHOIS succeeded - extract features
-        features['whois_lookup_failed'] = 0
-        features['whois_timeout'] = 0
-        features['whois_domain_not_found'] = 0
-        features['whois_private_registry'] = 0
-        features['whois_quota_exceeded'] = 0
-        features['whois_other_error'] = 0
+                record['error'] = 'whois_other_error'
+            WHOIS_ERRORS.inc(record['error'].replace('whois_', ''))
+            return record
         
         try:
-            # Extract creation date
-            creation_date = whois_data.creation_date
-            if creation_date:
-                if isinstance(creation_date, list):
-                    creation_date = creation_date[0]
-                
-                if isinstance(creation_date, datetime):
-                    today = datetime.now(timezone.utc)
-                    age_days = (today - creation_date).days
-                    features['domain_age'] = max(0, age_days)
-                else:
-                    features['domain_age'] = -1
-            else:
-                features['domain_age'] = -1
-            
-            # Extract expiration date and calculate lifespan
-            expiration_date = whois_data.expiration_date
-            if creation_date and expiration_date:
-                if isinstance(expiration_date, list):
-                    expiration_date = expiration_date[0]
-                if isinstance(creation_date, list):
-                    creation_date = creation_date[0]
-                
-                if (isinstance(creation_date, datetime) and 
-                    isinstance(expiration_date, datetime)):
-                    lifespan = (expiration_date - creation_date).days
-                    features['domain_lifespan'] = max(0, lifespan)
-                else:
-                    features['domain_lifespan'] = -1
-            else:
-                features['domain_lifespan'] = -1
-                
+            record['creation_date'] = self._to_epoch(whois_data.creation_date)
+            if record['creation_date'] is not None:
+                record['expiration_date'] = self._to_epoch(whois_data.expiration_date)
         except Exception as e:
             # If any error occurs during date processing, mark as failed
-            features['whois_lookup_failed'] = 1
-            features['whois_other_error'] = 1
-            features['domain_age'] = -1
-            features['domain_lifespan'] = -1
+            record = {'creation_date': None, 'expiration_date': None, 'error': 'whois_other_error'}
+        return record
+    
+    @staticmethod
+    def _to_epoch(value):
+        """Epoch seconds of a WHOIS date (first one if a list); naive dates are UTC."""
+        if isinstance(value, list):
+            value = value[0] if value else None
+        if not isinstance(value, datetime):
+            return None
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.timestamp()
+    
+    @classmethod
+    def features_from_record(cls, record: dict) -> dict:
+        """WHOIS features as of now: ages are derived here, so cached records never go stale."""
+        features = {
+            'whois_lookup_failed': 1,
+            'domain_age': -1,
+            'domain_lifespan': -1,
+            'whois_timeout': 0,
+            'whois_domain_not_found': 0,
+            'whois_private_registry': 0,
+            'whois_quota_exceeded': 0,
+            'whois_other_error': 0
+        }
+        if record['error']:
+            flag = LOCAL_ERROR_FLAGS.get(record['error'], record['error'])
+            if flag in cls.ERROR_FLAGS:
+                features[flag] = 1
+            if record['error'] in LOCAL_ERROR_FLAGS:
+                # Not a model feature: tells callers the registry was never asked, so the
+                # result must not be cached as this URL's verdict
+                features[WHOIS_SKIPPED] = 1
+            return features
         
-        # Cache the result
-        self._cache[clean_domain] = features
+        features['whois_lookup_failed'] = 0
+        creation_date = record['creation_date']
+        if creation_date is not None:
+            features['domain_age'] = max(0, int((time.time() - creation_date) // 86400))
+            if record['expiration_date'] is not None:
+                features['domain_lifespan'] = max(0, int((record['expiration_date'] - creation_date) // 86400))
         return features
     
     def _is_ip_address(self, domain: str) -> bool:
@@ -200,5 +259,5 @@ class RobustWhoisHandler:
         return re.match(ip_pattern, domain) is not None
     
     def clear_cache(self):
-        """Clear the WHOIS cache"""
+        """Clear the in-process WHOIS cache (persistent entries expire by TTL)"""
         self._cache.clear()
\ No newline at end of file